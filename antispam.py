@@ -1,7 +1,10 @@
 """Антиспам: отслеживание сообщений и оповещения."""
 
+import asyncio
 import collections
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import timedelta
+from logging import getLogger
 
 import discord
 
@@ -13,14 +16,72 @@ from config import (
     SPAM_CHANNELS_THRESHOLD,
     SPAM_ALERT_COOLDOWN,
     NEW_ACCOUNT_DAYS_THRESHOLD,
+    RAID_JOIN_WINDOW,
+    RAID_JOIN_THRESHOLD,
+    RAID_QUARANTINE,
+    MUTE_ROLE_ID,
+    DUPLICATE_WINDOW,
+    DUPLICATE_CHANNELS_THRESHOLD,
+    DUPLICATE_SIMILARITY,
+    DUPLICATE_MIN_LENGTH,
 )
+from duplicates import DuplicateIndex
+import patterns
 from embeds import LOG_COLORS, _utcnow
+from state_store import TTLCache
 
+logger = getLogger(__name__)
 
-user_message_log: dict[int, collections.deque] = collections.defaultdict(
-    lambda: collections.deque()
+
+class ChannelWindow:
+    """Скользящее окно сообщений пользователя.
+
+    Вместе с очередью (время, канал) ведётся счётчик сообщений по каналам,
+    который обновляется при добавлении и вытеснении записей, — число
+    уникальных каналов доступно за O(1) без пересборки множества.
+    """
+
+    __slots__ = ("_entries", "_counts")
+
+    def __init__(self):
+        self._entries: collections.deque[tuple[float, int]] = collections.deque()
+        self._counts: dict[int, int] = {}
+
+    def push(self, ts: float, channel_id: int):
+        self._entries.append((ts, channel_id))
+        self._counts[channel_id] = self._counts.get(channel_id, 0) + 1
+
+    def evict(self, cutoff: float):
+        entries, counts = self._entries, self._counts
+        while entries and entries[0][0] < cutoff:
+            _, channel_id = entries.popleft()
+            left = counts[channel_id] - 1
+            if left:
+                counts[channel_id] = left
+            else:
+                del counts[channel_id]
+
+    @property
+    def distinct_channels(self) -> int:
+        return len(self._counts)
+
+    def channels(self):
+        return self._counts.keys()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Окно пользователя, молчавшего дольше SPAM_TIME_WINDOW, целиком устарело.
+user_message_log: TTLCache = TTLCache(
+    "antispam.user_message_log", maxsize=50_000, ttl=SPAM_TIME_WINDOW, default_factory=ChannelWindow,
+)
+last_spam_alert: TTLCache = TTLCache(
+    "antispam.last_spam_alert", maxsize=10_000, ttl=SPAM_ALERT_COOLDOWN,
+)
+duplicate_index = DuplicateIndex(
+    DUPLICATE_WINDOW, threshold=DUPLICATE_SIMILARITY, min_length=DUPLICATE_MIN_LENGTH,
 )
-last_spam_alert: dict[int, datetime] = {}
 
 
 async def send_spam_alert(
@@ -60,8 +121,156 @@ async def send_spam_alert(
     await channel.send(mention_text or None, embed=embed)
 
 
+RAID_ALERT_EDIT_INTERVAL = 3.0
+RAID_ALERT_MAX_LINES = 60
+
+
+class JoinRaidDetector:
+    """Детектор рейдов: скользящее окно входов на сервер.
+
+    Пока за RAID_JOIN_WINDOW секунд заходит меньше RAID_JOIN_THRESHOLD
+    участников, работает обычная проверка молодых аккаунтов. При превышении
+    порога включается режим рейда: вместо оповещения на каждого участника
+    отправляется одно сообщение, которое редактируется по мере новых входов.
+    Рейд заканчивается, когда входов нет дольше окна.
+
+    Карантин (RAID_QUARANTINE) выдаётся фоновой задачей пачками через
+    bulk_update_role, поэтому обработчик входа не ждёт запросов к Discord.
+    """
+
+    def __init__(self):
+        self._joins: collections.deque[tuple[float, discord.Member]] = collections.deque()
+        self.active = False
+        self.started_at = 0.0
+        self.last_join = 0.0
+        self.members: list[tuple[discord.Member, int]] = []
+        self.quarantined: set[int] = set()
+        self._message: discord.Message | None = None
+        self._dirty = False
+        self._updater: asyncio.Task | None = None
+        self._to_quarantine: list[discord.Member] = []
+        self._quarantiner: asyncio.Task | None = None
+
+    async def on_join(self, member: discord.Member, bot) -> bool:
+        """Учитывает вход; возвращает True, если идёт рейд и отдельное оповещение не нужно."""
+        now = time.time()
+        self._joins.append((now, member))
+        while self._joins[0][0] < now - RAID_JOIN_WINDOW:
+            self._joins.popleft()
+        self.last_join = now
+
+        if not self.active:
+            if len(self._joins) < RAID_JOIN_THRESHOLD:
+                return False
+            self.active = True
+            self.started_at = self._joins[0][0]
+            self.members = []
+            self.quarantined = set()
+            self._message = None
+            for _, joined in self._joins:
+                self._add(joined)
+            logger.warning(f"Join raid detected: {len(self._joins)} joins in {RAID_JOIN_WINDOW}s")
+        else:
+            self._add(member)
+
+        self._dirty = True
+        if self._updater is None or self._updater.done():
+            self._updater = asyncio.create_task(self._update_loop(bot))
+        return True
+
+    def _add(self, member: discord.Member):
+        age_days = (_utcnow() - member.created_at).days
+        self.members.append((member, age_days))
+        if RAID_QUARANTINE and age_days < NEW_ACCOUNT_DAYS_THRESHOLD:
+            self._to_quarantine.append(member)
+            if self._quarantiner is None or self._quarantiner.done():
+                self._quarantiner = asyncio.create_task(self._quarantine_loop())
+
+    async def _quarantine_loop(self):
+        while self._to_quarantine:
+            batch, self._to_quarantine = self._to_quarantine, []
+            role = batch[0].guild.get_role(MUTE_ROLE_ID)
+            if not role:
+                dropped = len(batch) + len(self._to_quarantine)
+                self._to_quarantine.clear()
+                logger.error(f"Raid quarantine: mute role {MUTE_ROLE_ID} not found, {dropped} members not quarantined")
+                return
+            from bulk_roles import bulk_update_role
+            result = await bulk_update_role(batch, role, add=True, reason="Карантин: рейд на сервер")
+            # Уже замьюченные тоже в карантине — просто не нами.
+            self.quarantined.update(m.id for m in result.succeeded + result.skipped)
+            self._dirty = True
+
+    def _quarantine_pending(self) -> bool:
+        return self._quarantiner is not None and not self._quarantiner.done()
+
+    def _build_embed(self, finished: bool) -> discord.Embed:
+        duration = int(self.last_join - self.started_at)
+        young = sum(1 for _, age in self.members if age < NEW_ACCOUNT_DAYS_THRESHOLD)
+        embed = discord.Embed(
+            title="Антиспам: рейд завершён" if finished else "Антиспам: идёт рейд на сервер!",
+            color=LOG_COLORS["spam"],
+            timestamp=_utcnow(),
+        )
+        lines = [
+            f"{m.mention} (`{m}`) — `{age}` дн.{' · карантин' if m.id in self.quarantined else ''}"
+            for m, age in self.members[-RAID_ALERT_MAX_LINES:]
+        ]
+        hidden = len(self.members) - len(lines)
+        if hidden > 0:
+            lines.insert(0, f"…и ещё {hidden} ранее")
+        embed.description = "\n".join(lines)[:4096]
+        embed.add_field(name="Входов", value=f"`{len(self.members)}` за `{duration}` сек.", inline=True)
+        embed.add_field(name="Молодых аккаунтов", value=f"`{young}` (< {NEW_ACCOUNT_DAYS_THRESHOLD} дн.)", inline=True)
+        if RAID_QUARANTINE:
+            embed.add_field(name="В карантине", value=f"`{len(self.quarantined)}`", inline=True)
+        return embed
+
+    async def _update_loop(self, bot):
+        channel = bot.get_channel(ANTISPAM_CHANNEL_ID) if bot else None
+        if not channel:
+            logger.error(f"Antispam channel {ANTISPAM_CHANNEL_ID} not found, raid alert dropped.")
+            # Иначе on_join считал бы рейд идущим и глушил все следующие входы.
+            self.active = False
+            self._joins.clear()
+            return
+        while True:
+            # Итоговое сообщение ждёт окончания карантина, чтобы счётчик был точным.
+            finished = time.time() - self.last_join > RAID_JOIN_WINDOW and not self._quarantine_pending()
+            if finished:
+                self.active = False
+            if self._dirty or finished:
+                self._dirty = False
+                embed = self._build_embed(finished)
+                try:
+                    if self._message is None:
+                        self._message = await channel.send(
+                            f"<@&{YOUR_ADMIN_ROLE_ID}> <@&{MODERATOR_ROLE_ID}>", embed=embed
+                        )
+                    else:
+                        await self._message.edit(embed=embed)
+                except discord.HTTPException as e:
+                    logger.error(f"Failed to update raid alert: {e}")
+            if finished:
+                if self.active:
+                    # Пока шла последняя правка, начался новый рейд: on_join
+                    # видел эту задачу живой и новую не запустил.
+                    continue
+                return
+            await asyncio.sleep(RAID_ALERT_EDIT_INTERVAL)
+
+
+join_raid = JoinRaidDetector()
+
+
 async def check_new_account(member: discord.Member, bot = None):
-    """Проверяет возраст аккаунта нового участника и оповещает антиспам-канал без пинга ролей."""
+    """Проверяет возраст аккаунта нового участника и оповещает антиспам-канал без пинга ролей.
+
+    Во время рейда участник попадает в общее оповещение о рейде.
+    """
+    if await join_raid.on_join(member, bot):
+        return
+
     now = _utcnow()
     account_age = now - member.created_at
     if account_age >= timedelta(days=NEW_ACCOUNT_DAYS_THRESHOLD):
@@ -79,13 +288,13 @@ async def check_new_account(member: discord.Member, bot = None):
     )
 
 
+# Время пишется в серию handlers/check_spam прямо в on_message (events.py).
 async def check_spam(message: discord.Message, bot = None):
     if message.author.bot or not message.guild:
         return
 
     member = message.author
     user_id = member.id
-    now = _utcnow()
 
     if "@everyone" in message.content or "@here" in message.content:
         if not member.guild_permissions.mention_everyone:
@@ -98,19 +307,47 @@ async def check_spam(message: discord.Message, bot = None):
             )
             return
 
-    cutoff = now - timedelta(seconds=SPAM_TIME_WINDOW)
-    log = user_message_log[user_id]
-    log.append((now, message.channel.id))
-    while log and log[0][0] < cutoff:
-        log.popleft()
+    if not member.guild_permissions.manage_messages:
+        hits = patterns.match(message.content)
+        if hits:
+            preview = message.content[:300].replace("```", "")
+            found = ", ".join(f"{kind}: `{text}`" for kind, text in hits[:10])
+            await send_spam_alert(
+                user=member,
+                reason="Запрещённый контент",
+                details=f"Канал: {message.channel.mention}\nСовпадения: {found}\nТекст:\n```{preview}```",
+                bot=bot,
+            )
+            return
+
+    ts = time.time()
+    window = user_message_log[user_id]
+    window.push(ts, message.channel.id)
+    window.evict(ts - SPAM_TIME_WINDOW)
+
+    match = duplicate_index.add(ts, message.content, user_id, message.channel.id)
+    # Модераторы рассылают объявления по каналам — это не спам.
+    if (match and len(match.channels) >= DUPLICATE_CHANNELS_THRESHOLD
+            and not member.guild_permissions.manage_messages):
+        preview = message.content[:300].replace("```", "")
+        channel_mentions = ", ".join(f"<#{ch_id}>" for ch_id in list(match.channels)[:15])
+        await send_spam_alert(
+            user=member,
+            reason=(
+                f"Похожие сообщения в {len(match.channels)} каналах "
+                f"от {len(match.users)} пользователей за {DUPLICATE_WINDOW // 60} мин."
+            ),
+            details=f"Каналы: {channel_mentions}\nСообщений: `{match.messages}`\nТекст:\n```{preview}```",
+            bot=bot,
+        )
+        return
 
-    unique_channels = {entry[1] for entry in log}
-    if len(unique_channels) >= SPAM_CHANNELS_THRESHOLD:
-        channel_mentions = ", ".join(f"<#{ch_id}>" for ch_id in unique_channels)
+    if window.distinct_channels >= SPAM_CHANNELS_THRESHOLD:
+        channel_mentions = ", ".join(f"<#{ch_id}>" for ch_id in window.channels())
         window_minutes = SPAM_TIME_WINDOW // 60
         await send_spam_alert(
             user=member,
-            reason=f"Сообщения в {len(unique_channels)} каналах за {window_minutes} мин.",
-            details=f"Каналы: {channel_mentions}\nСообщений в окне: `{len(log)}`",
+            reason=f"Сообщения в {window.distinct_channels} каналах за {window_minutes} мин.",
+            details=f"Каналы: {channel_mentions}\nСообщений в окне: `{len(window)}`",
             bot=bot,
         )
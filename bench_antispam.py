@@ -0,0 +1,66 @@
+"""Микробенчмарк окна антиспама: стоимость одного сообщения при разном размере окна.
+
+Сравнивает ChannelWindow (инкрементальный счётчик каналов) со старой схемой,
+где на каждое сообщение множество каналов пересобиралось по всей очереди.
+У ChannelWindow время на сообщение не должно зависеть от размера окна.
+
+Запуск из корня проекта (нужен тот же .env, что и боту):
+    python bench_antispam.py [--messages N] [--channels K]
+"""
+
+import argparse
+import collections
+import random
+from time import perf_counter
+
+from antispam import ChannelWindow
+
+WINDOW_SIZES = (10, 100, 1000)
+
+
+def _events(window_size: int, messages: int, channels: int) -> list[tuple[float, int]]:
+    # Одно сообщение в секунду: в окне длиной window_size сек ровно window_size записей.
+    rng = random.Random(window_size)
+    return [(float(i), rng.randrange(channels)) for i in range(messages + window_size)]
+
+
+def bench_channel_window(events, window_size: int, messages: int) -> float:
+    window = ChannelWindow()
+    for ts, channel_id in events[:window_size]:
+        window.push(ts, channel_id)
+    started = perf_counter()
+    for ts, channel_id in events[window_size:]:
+        window.push(ts, channel_id)
+        window.evict(ts - window_size)
+        window.distinct_channels
+    return (perf_counter() - started) / messages
+
+
+def bench_rebuild_set(events, window_size: int, messages: int) -> float:
+    log = collections.deque(events[:window_size])
+    started = perf_counter()
+    for ts, channel_id in events[window_size:]:
+        log.append((ts, channel_id))
+        cutoff = ts - window_size
+        while log and log[0][0] < cutoff:
+            log.popleft()
+        len({entry[1] for entry in log})
+    return (perf_counter() - started) / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--channels", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'window':>8} {'ChannelWindow, us':>18} {'rebuild set, us':>16}")
+    for size in WINDOW_SIZES:
+        events = _events(size, args.messages, args.channels)
+        incremental = bench_channel_window(events, size, args.messages)
+        rebuild = bench_rebuild_set(events, size, args.messages)
+        print(f"{size:>8} {incremental * 1e6:>18.2f} {rebuild * 1e6:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Бенчмарк накладных расходов метрик на пути обработки сообщения.
+
+Сравнивает одну и ту же работу on_message (поиск запрещённых шаблонов и
+индекс дубликатов, как в check_spam) без инструментирования и с тем же
+ручным замером, что в on_message бота: серии on_message и check_spam.
+Сообщения режутся на короткие куски; каждый кусок прогоняется обоими
+вариантами подряд (порядок чередуется, индекс дубликатов каждый раз
+новый), и итог — медиана отношений внутри пар. Так дрейф частоты CPU и
+фоновая нагрузка сокращаются, а не попадают в разницу. Для сравнения
+отдельно меряется стоимость обёртки metrics.timed на пустой корутине.
+
+Запуск из корня проекта:
+    python bench_metrics.py [--messages N] [--rounds R] [--chunk C] [--patterns P]
+
+Код возврата 1, если накладные расходы больше BUDGET_PERCENT.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+from time import perf_counter
+
+import metrics
+from bench_patterns import _generate_messages, _generate_patterns
+from duplicates import DuplicateIndex
+from patterns import PatternMatcher
+
+# Допустимые накладные расходы, %.
+BUDGET_PERCENT = 2.0
+
+
+def _make_handlers(matcher: PatternMatcher):
+    state = {"index": None}
+
+    async def check_spam(ts: float, text: str, user_id: int, channel_id: int):
+        if matcher.match(text):
+            return
+        state["index"].add(ts, text, user_id, channel_id)
+
+    async def on_message(ts: float, text: str, user_id: int, channel_id: int):
+        await check_spam(ts, text, user_id, channel_id)
+
+    on_message_metrics = metrics.handlers.series("bench_on_message")
+    check_spam_metrics = metrics.handlers.series("bench_check_spam")
+
+    # Повторяет замер из events.on_message.
+    async def timed_on_message(ts: float, text: str, user_id: int, channel_id: int):
+        started = perf_counter()
+        try:
+            try:
+                await check_spam(ts, text, user_id, channel_id)
+            except Exception:
+                check_spam_metrics.errors += 1
+                raise
+            finally:
+                check_spam_metrics.observe(perf_counter() - started)
+        except Exception:
+            on_message_metrics.errors += 1
+            raise
+        finally:
+            on_message_metrics.observe(perf_counter() - started)
+
+    return state, on_message, timed_on_message
+
+
+async def _run_round(handler, state: dict, events) -> float:
+    state["index"] = DuplicateIndex(600)
+    started = perf_counter()
+    for event in events:
+        await handler(*event)
+    return (perf_counter() - started) / len(events)
+
+
+async def _wrapper_cost(calls: int) -> float:
+    async def noop():
+        pass
+
+    timed_noop = metrics.timed(metrics.handlers, "bench_noop")(noop)
+    best = []
+    for func in (noop, timed_noop):
+        samples = []
+        for _ in range(5):
+            started = perf_counter()
+            for _ in range(calls):
+                await func()
+            samples.append((perf_counter() - started) / calls)
+        best.append(min(samples))
+    return best[1] - best[0]
+
+
+async def main_async(args):
+    rng = random.Random(0)
+    patterns = _generate_patterns(args.patterns, rng)
+    messages = _generate_messages(args.messages, patterns, rng)
+    events = [(float(i), text, rng.randrange(500), rng.randrange(20)) for i, text in enumerate(messages)]
+    state, plain, timed = _make_handlers(PatternMatcher(patterns))
+
+    # Прогрев: регулярное выражение, кэши, аллокатор.
+    await _run_round(plain, state, events[:1000])
+    await _run_round(timed, state, events[:1000])
+
+    plain_times, timed_times, ratios = [], [], []
+    chunks = [events[i:i + args.chunk] for i in range(0, len(events), args.chunk)]
+    for r in range(args.rounds):
+        for c, chunk in enumerate(chunks):
+            if (r + c) % 2:
+                timed_t = await _run_round(timed, state, chunk)
+                plain_t = await _run_round(plain, state, chunk)
+            else:
+                plain_t = await _run_round(plain, state, chunk)
+                timed_t = await _run_round(timed, state, chunk)
+            plain_times.append(plain_t)
+            timed_times.append(timed_t)
+            ratios.append(timed_t / plain_t)
+
+    plain_us = statistics.median(plain_times) * 1e6
+    timed_us = statistics.median(timed_times) * 1e6
+    overhead = (statistics.median(ratios) - 1) * 100
+    wrapper_us = await _wrapper_cost(args.wrapper_calls) * 1e6
+
+    print(f"messages: {len(events)}, rounds: {args.rounds}, chunk: {args.chunk}, patterns: {args.patterns}")
+    print(f"plain handler:  {plain_us:.1f} us/message (median)")
+    print(f"timed handler:  {timed_us:.1f} us/message (median)")
+    print(f"overhead:       {overhead:+.2f}% (median of {len(ratios)} paired chunks, budget {BUDGET_PERCENT}%)")
+    print(f"timed wrapper:  {wrapper_us:.2f} us/call = {wrapper_us / plain_us * 100:.2f}% of the handler (not used on this path)")
+    return overhead
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5_000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--chunk", type=int, default=250)
+    parser.add_argument("--patterns", type=int, default=1_000)
+    parser.add_argument("--wrapper-calls", type=int, default=200_000)
+    args = parser.parse_args()
+    overhead = asyncio.run(main_async(args))
+    raise SystemExit(0 if overhead <= BUDGET_PERCENT else 1)
+
+
+if __name__ == "__main__":
+    main()
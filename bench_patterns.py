@@ -0,0 +1,96 @@
+"""Бенчмарк матчера запрещённого контента на большом списке шаблонов.
+
+Генерирует PATTERNS шаблонов (фразы и домены пополам) и набор сообщений,
+часть которых содержит совпадения, затем меряет время сборки PatternMatcher
+и пропускную способность match(). Для сравнения прогоняет наивный цикл
+по отдельным регулярным выражениям на каждый шаблон (на меньшей выборке —
+он медленный).
+
+Запуск из корня проекта:
+    python bench_patterns.py [--patterns N] [--messages M]
+"""
+
+import argparse
+import random
+import re
+import string
+from time import perf_counter
+
+from patterns import PatternMatcher
+
+WORDS = (
+    "привет как дела кто идёт сегодня стрим завтра новый ролик смотрел вчера "
+    "бесплатно подарок нитро ссылка сервер игра катка го скинь голос канал "
+    "hello free gift nitro steam trade skin drop link click here"
+).split()
+
+
+def _generate_patterns(count: int, rng: random.Random) -> dict[str, set[str]]:
+    phrases, domains = set(), set()
+    while len(phrases) < count // 2:
+        phrases.add(" ".join(rng.choice(WORDS) + "".join(rng.choices(string.ascii_lowercase, k=3))
+                             for _ in range(rng.randint(2, 4))))
+    while len(domains) < count - count // 2:
+        name = "".join(rng.choices(string.ascii_lowercase + "-", k=rng.randint(6, 14))).strip("-") or "x"
+        domains.add(f"{name}.{rng.choice(('com', 'ru', 'gift', 'xyz', 'net'))}")
+    return {"phrase": phrases, "domain": domains}
+
+
+def _generate_messages(count: int, patterns: dict[str, set[str]], rng: random.Random) -> list[str]:
+    hits = sorted(patterns["phrase"]) + sorted(patterns["domain"])
+    messages = []
+    for i in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(5, 40))]
+        if i % 10 == 0:
+            words.insert(rng.randrange(len(words)), rng.choice(hits))
+        if i % 50 == 0:
+            words.append("discord.gg/abcdef")
+        messages.append(" ".join(words))
+    return messages
+
+
+def bench_matcher(matcher: PatternMatcher, messages: list[str]) -> tuple[float, int]:
+    started = perf_counter()
+    found = sum(1 for text in messages if matcher.match(text))
+    return perf_counter() - started, found
+
+
+def bench_naive(patterns: dict[str, set[str]], messages: list[str]) -> float:
+    regexes = [re.compile(rf"(?<!\w){re.escape(p)}(?!\w)") for p in patterns["phrase"]]
+    regexes += [re.compile(rf"(?<![\w-]){re.escape(p)}(?![\w-])") for p in patterns["domain"]]
+    started = perf_counter()
+    for text in messages:
+        lowered = text.lower()
+        [r.pattern for r in regexes if r.search(lowered)]
+    return perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patterns", type=int, default=10_000)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--naive-messages", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    patterns = _generate_patterns(args.patterns, rng)
+    messages = _generate_messages(args.messages, patterns, rng)
+
+    started = perf_counter()
+    matcher = PatternMatcher(patterns)
+    build = perf_counter() - started
+    print(f"patterns: {args.patterns}, build: {build:.3f} s")
+
+    elapsed, found = bench_matcher(matcher, messages)
+    print(f"PatternMatcher: {len(messages) / elapsed:,.0f} messages/s, "
+          f"{elapsed / len(messages) * 1e6:.1f} us/message, {found} with hits")
+
+    if args.naive_messages:
+        sample = messages[:args.naive_messages]
+        naive = bench_naive(patterns, sample)
+        print(f"regex per pattern: {len(sample) / naive:,.0f} messages/s, "
+              f"{naive / len(sample) * 1e6:.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
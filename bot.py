@@ -1,6 +1,12 @@
 """Stakan Discord Bot — точка входа."""
 
+# Должен импортироваться первым, чтобы замерить остальные импорты.
+import startup_profile
+
 import sys
+import time
+import json
+import hashlib
 import logging
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
@@ -9,10 +15,21 @@ import discord
 from discord.ext import commands
 
 # ─── Конфиг ───────────────────────────────────────────────────────────────
-from config import DISCORD_TOKEN, DB_FILE, GUILD_ID
+from config import (
+    DISCORD_TOKEN,
+    DB_FILE,
+    GUILD_ID,
+    METRICS_HOST,
+    METRICS_PORT,
+    LOOP_STALL_THRESHOLD,
+    AUTO_DEFER_AFTER,
+)
 
 # ─── БД ───────────────────────────────────────────────────────────────────
-from database import create_tables
+from database import create_tables, close_db, write_queue, get_meta, set_meta
+from embeds import log_sink
+from command_context import StakanContext
+import metrics
 
 # ─── Logger ───────────────────────────────────────────────────────────────
 
@@ -41,34 +58,155 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-bot = commands.Bot(command_prefix='!', intents=intents, log_handler=None)
+# Модули команд и событий — расширения discord.py (async def setup(bot)),
+# которые можно перезагружать по одному без переподключения к gateway.
+EXTENSIONS = (
+    "commands.moderation",
+    "commands.fun",
+    "commands.admin",
+    "commands.subscribe",
+    "commands.help",
+    "events",
+)
+
+
+class StakanTree(discord.app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Начало отсчёта для чистых слэш-команд (см. _app_command_completed);
+        # гибридные команды замеряются хуками before/after_invoke.
+        interaction.extras["metrics_started"] = time.perf_counter()
+        return True
+
+
+def _observe_app_command(interaction: discord.Interaction, error: bool):
+    started = interaction.extras.get("metrics_started")
+    if started is None or interaction.extras.get("timed_by_context") or interaction.command is None:
+        return
+    metrics.commands.observe(interaction.command.qualified_name, time.perf_counter() - started, error)
+
+
+class StakanBot(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Состояние, которое расширение передаёт своей новой версии при
+        # перезагрузке (teardown кладёт, setup забирает).
+        self.extension_state: dict[str, dict] = {}
+        self.syncs_skipped = 0
+
+    async def get_context(self, origin, *, cls=StakanContext):
+        return await super().get_context(origin, cls=cls)
+
+    async def setup_hook(self):
+        metrics.instrument_discord_http(self.http)
+        for name in EXTENSIONS:
+            await self.load_extension(name)
+        startup_profile.checkpoint("extensions loaded")
+
+    async def reload_modules(self, names: list[str] | None = None) -> list[tuple[str, float, Exception | None]]:
+        """Перезагружает расширения по одному; возвращает (имя, мс, ошибка).
+
+        Короткие имена ("admin") дополняются до "commands.admin"; неизвестное
+        имя — KeyError. При ошибке discord.py оставляет старую версию модуля.
+        """
+        resolved = []
+        for name in names or EXTENSIONS:
+            if name not in EXTENSIONS:
+                name = f"commands.{name}"
+                if name not in EXTENSIONS:
+                    raise KeyError(name)
+            resolved.append(name)
+
+        results = []
+        for name in resolved:
+            started = time.perf_counter()
+            error = None
+            try:
+                await self.reload_extension(name)
+            except commands.ExtensionError as e:
+                logger.error(f"Reload of {name} failed: {e!r}", exc_info=e)
+                error = e
+            results.append((name, (time.perf_counter() - started) * 1000, error))
+        # Если перезагрузка поменяла сигнатуры команд — досинхронизировать.
+        await self.sync_tree()
+        return results
+
+    async def sync_tree(self, *, force: bool = False) -> bool:
+        """Синхронизирует слэш-команды с гильдией, если дерево изменилось.
+
+        Хэш сериализованного дерева хранится в БД; при совпадении REST-запрос
+        не делается. Возвращает True, если синхронизация выполнялась.
+        """
+        started = time.perf_counter()
+        guild = discord.Object(id=GUILD_ID)
+        self.tree.copy_global_to(guild=guild)
+        payload = sorted(
+            (cmd.to_dict(self.tree) for cmd in self.tree.get_commands(guild=guild)),
+            key=lambda c: (c.get("type", 1), c["name"]),
+        )
+        digest = hashlib.sha256(
+            json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()
+        ).hexdigest()
+        meta_key = f"command_tree_hash:{self.application_id}:{GUILD_ID}"
+
+        if not force and await get_meta(meta_key) == digest:
+            self.syncs_skipped += 1
+            logger.info(
+                f"Slash commands unchanged, sync skipped in {(time.perf_counter() - started) * 1000:.1f} ms "
+                f"({self.syncs_skipped} skipped since start)"
+            )
+            return False
+
+        synced = await self.tree.sync(guild=guild)
+        await set_meta(meta_key, digest)
+        logger.info(
+            f"Slash commands synced to guild {GUILD_ID}: {len(synced)} команд "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms{' (forced)' if force else ''}"
+        )
+        return True
+
+    async def close(self):
+        import websub
+        await websub.stop()
+        await metrics.stop_server()
+        import loop_watchdog
+        loop_watchdog.stop()
+        # Отложенные записи в БД должны попасть на диск до остановки loop.
+        await write_queue.close()
+        await log_sink.flush(self)
+        await super().close()
+
+
+bot = StakanBot(command_prefix='!', intents=intents, log_handler=None, tree_cls=StakanTree)
 bot.remove_command('help')
 
-# ─── Register modules ────────────────────────────────────────────────────
 
-def register_all():
-    from commands import moderation as mod_cmds
-    from commands import fun
-    from commands import admin
-    from commands import subscribe
-    from commands import help as help_cmd
-    from events import register as register_events
-    from tasks import check_mutes
+@bot.before_invoke
+async def _start_command_timer(ctx: StakanContext):
+    ctx.metrics_started = time.perf_counter()
+    if ctx.interaction is not None:
+        ctx.interaction.extras["timed_by_context"] = True
+    # Медленные слэш- и гибридные команды подтверждаются defer() до лимита Discord.
+    ctx.start_auto_defer(AUTO_DEFER_AFTER)
+
+
+@bot.after_invoke
+async def _stop_command_timer(ctx: StakanContext):
+    ctx.stop_auto_defer()
+    # При ошибке ответит on_command_error.
+    if not ctx.command_failed:
+        await ctx.finish_response()
+    ctx.observe_command(ctx.command_failed)
 
-    mod_cmds.register(bot)
-    fun.register(bot)
-    admin.register(bot)
-    subscribe.register(bot)
-    help_cmd.register(bot)
-    register_events(bot)
 
-    # Сохраняем ссылку на задачу для запуска в on_ready
-    bot._check_mutes_task = check_mutes
+@bot.listen("on_app_command_completion")
+async def _app_command_completed(interaction: discord.Interaction, command):
+    _observe_app_command(interaction, error=False)
 
 # ─── On ready ─────────────────────────────────────────────────────────────
 
 @bot.event
 async def on_ready():
+    startup_profile.checkpoint("on_ready")
     logger.info(f"{bot.user} is online and ready")
 
     # Синхронизация по конкретной гильдии применяется мгновенно.
@@ -77,13 +215,23 @@ async def on_ready():
     # присылать интеракции со СТАРОЙ сигнатурой команды, что приводит
     # к "The application did not respond", т.к. эти ошибки не долетают
     # до on_command_error (см. on_app_command_error ниже).
-    guild = discord.Object(id=GUILD_ID)
-    bot.tree.copy_global_to(guild=guild)
-    synced = await bot.tree.sync(guild=guild)
-    logger.info(f"Slash commands synced to guild {GUILD_ID}: {len(synced)} команд")
+    # READY приходит и после каждого переподключения, поэтому sync_tree
+    # обращается к Discord только если дерево команд изменилось.
+    await bot.sync_tree()
+    startup_profile.checkpoint("commands synced")
 
-    if not bot._check_mutes_task.is_running():
-        bot._check_mutes_task.start(bot)
+    from tasks import mute_scheduler, job_scheduler
+    import state_store
+    import websub
+    await mute_scheduler.start(bot)
+    await job_scheduler.start(bot)
+    state_store.start_sweeper()
+    await websub.start(bot)
+    import loop_watchdog
+    loop_watchdog.start(LOOP_STALL_THRESHOLD)
+    if METRICS_PORT:
+        await metrics.start_server(METRICS_HOST, METRICS_PORT)
+    startup_profile.report()
 
 
 # ─── Global app-commands error handler ───────────────────────────────────
@@ -99,6 +247,7 @@ async def on_app_command_error(interaction: discord.Interaction, error: discord.
     from embeds import e_err
 
     logger.error(f"App command error in /{interaction.command.name if interaction.command else '?'}: {error!r}", exc_info=error)
+    _observe_app_command(interaction, error=True)
 
     if isinstance(error, discord.app_commands.CheckFailure):
         message = "У вас нет прав для этой команды."
@@ -119,9 +268,14 @@ async def on_app_command_error(interaction: discord.Interaction, error: discord.
 # ─── Startup ──────────────────────────────────────────────────────────────
 
 if __name__ == '__main__':
+    startup_profile.checkpoint("imports")
     create_tables()
-    register_all()
+    startup_profile.checkpoint("database ready")
+    import patterns
+    from config import PATTERNS_FILE, BLOCK_INVITES
+    patterns.load_patterns(PATTERNS_FILE, invites=BLOCK_INVITES)
     if not DISCORD_TOKEN:
         print("ERROR: DISCORD_TOKEN not found in .env!")
     else:
         bot.run(DISCORD_TOKEN)
+    close_db()
@@ -0,0 +1,164 @@
+"""Массовая выдача и снятие ролей с учётом rate limit-ов Discord."""
+
+import asyncio
+import random
+import time
+from logging import getLogger
+
+import discord
+
+from embeds import e_info
+
+logger = getLogger(__name__)
+
+# Маршрут PUT/DELETE /guilds/{guild}/members/{user}/roles/{role} делит один
+# bucket на всю гильдию; на практике это около 10 запросов за 10 секунд.
+ROLE_ROUTE_RATE = 1.0       # токенов в секунду
+ROLE_ROUTE_BURST = 10       # ёмкость bucket-а
+BULK_CONCURRENCY = 4
+BULK_MAX_RETRIES = 3
+PROGRESS_INTERVAL = 3.0     # как часто обновлять статус-сообщение, сек
+
+SKIPPED = "skipped"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Один bucket на гильдию — как и у Discord.
+_buckets: dict[int, TokenBucket] = {}
+
+
+def _bucket_for(guild_id: int) -> TokenBucket:
+    bucket = _buckets.get(guild_id)
+    if bucket is None:
+        bucket = _buckets[guild_id] = TokenBucket(ROLE_ROUTE_RATE, ROLE_ROUTE_BURST)
+    return bucket
+
+
+class BulkRoleResult:
+    def __init__(self, total: int):
+        self.total = total
+        self.succeeded: list[discord.Member] = []
+        # У кого роль уже была (или уже не было) до вызова — их не трогали.
+        self.skipped: list[discord.Member] = []
+        self.failed: list[tuple[discord.Member, str]] = []
+
+    @property
+    def done(self) -> int:
+        return len(self.succeeded) + len(self.skipped) + len(self.failed)
+
+    def summary(self) -> str:
+        text = f"Успешно: **{len(self.succeeded)}** из {self.total}"
+        if self.skipped:
+            text += f" · уже было: **{len(self.skipped)}**"
+        if self.failed:
+            text += f" · ошибок: **{len(self.failed)}**"
+        return text
+
+    def failed_details(self, limit: int = 15) -> str:
+        lines = [f"{m.mention} — {error}" for m, error in self.failed[:limit]]
+        if len(self.failed) > limit:
+            lines.append(f"…и ещё {len(self.failed) - limit}")
+        return "\n".join(lines)
+
+
+async def _apply_one(member: discord.Member, role: discord.Role, add: bool, reason: str | None,
+                     bucket: TokenBucket) -> str | None:
+    """Возвращает None при успехе, SKIPPED, если менять нечего, или текст ошибки."""
+    if (role in member.roles) == add:
+        return SKIPPED
+    for attempt in range(BULK_MAX_RETRIES + 1):
+        await bucket.acquire()
+        try:
+            if add:
+                await member.add_roles(role, reason=reason)
+            else:
+                await member.remove_roles(role, reason=reason)
+            return None
+        except (discord.Forbidden, discord.NotFound) as e:
+            return f"{e.status} {e.text or type(e).__name__}"
+        except discord.HTTPException as e:
+            if (e.status != 429 and e.status < 500) or attempt == BULK_MAX_RETRIES:
+                return f"{e.status} {e.text or type(e).__name__}"
+            await asyncio.sleep(2 ** attempt + random.random())
+    return "retries exhausted"
+
+
+async def bulk_update_role(
+    members: list[discord.Member],
+    role: discord.Role,
+    *,
+    add: bool = True,
+    reason: str = None,
+    status_message: discord.Message = None,
+    concurrency: int = BULK_CONCURRENCY,
+) -> BulkRoleResult:
+    """Выдаёт или снимает роль у всех участников с ограниченной параллельностью.
+
+    Запросы проходят через token bucket гильдии; 429 и 5xx повторяются с
+    экспоненциальной задержкой. Если передан status_message, он периодически
+    редактируется с текущим прогрессом.
+
+    Участники, у которых роль уже в нужном состоянии, попадают в
+    result.skipped, а не в succeeded: их нельзя включать в отложенное
+    снятие, иначе оно досрочно отменит мут, выданный отдельно.
+    """
+    result = BulkRoleResult(len(members))
+    bucket = _bucket_for(role.guild.id)
+    queue: asyncio.Queue[discord.Member] = asyncio.Queue()
+    for member in members:
+        queue.put_nowait(member)
+
+    async def worker():
+        while True:
+            try:
+                member = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                error = await _apply_one(member, role, add, reason, bucket)
+            except Exception as e:
+                error = repr(e)
+            if error is None:
+                result.succeeded.append(member)
+            elif error is SKIPPED:
+                result.skipped.append(member)
+            else:
+                logger.warning(f"Bulk role {'add' if add else 'remove'} failed for {member.id}: {error}")
+                result.failed.append((member, error))
+
+    async def progress():
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            try:
+                await status_message.edit(embed=e_info(
+                    "Выполняется…", f"Обработано {result.done} из {result.total}\n{result.summary()}"
+                ))
+            except discord.HTTPException:
+                pass
+
+    reporter = asyncio.create_task(progress()) if status_message else None
+    try:
+        await asyncio.gather(*[worker() for _ in range(max(1, min(concurrency, len(members))))])
+    finally:
+        if reporter:
+            reporter.cancel()
+    return result
@@ -0,0 +1,128 @@
+"""Контекст команд с автоматическим defer для слэш-вызовов.
+
+Discord ждёт первого ответа на интеракцию не дольше 3 секунд с момента её
+создания. Если команда не ответила за AUTO_DEFER_AFTER секунд, контекст
+сам вызывает defer(), и дальнейшие ctx.send уходят в followup (это уже
+умеет commands.Context). Первый ответ и автоматический defer
+сериализуются блокировкой, чтобы не подтвердить интеракцию дважды.
+
+Время до первого ответа (send или defer) пишется в метрики по командам,
+длительность команды — один раз, из after_invoke или on_command_error.
+После автоматического defer первый ответ заменяет сообщение «думает…» и
+поэтому не может быть ephemeral. Если команда завершилась, так и не
+ответив через ctx, finish_response закрывает интеракцию сам.
+"""
+
+import asyncio
+import time
+from logging import getLogger
+
+import discord
+from discord.ext import commands
+
+import metrics
+from embeds import e_ok
+
+logger = getLogger(__name__)
+
+
+class StakanContext(commands.Context):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._response_lock = asyncio.Lock()
+        self._auto_defer_task: asyncio.Task | None = None
+        self.first_response_after: float | None = None
+        self.auto_deferred = False
+        self._deferred = False
+        self._replied = False
+        self.metrics_started: float | None = None
+        self._metrics_recorded = False
+
+    def _since_created(self) -> float:
+        return max(0.0, time.time() - self.interaction.created_at.timestamp())
+
+    def _mark_response(self):
+        if self.first_response_after is not None or self.interaction is None:
+            return
+        self.first_response_after = self._since_created()
+        if self.command is not None:
+            metrics.first_response.observe(self.command.qualified_name, self.first_response_after)
+
+    def observe_command(self, failed: bool):
+        """Записывает длительность команды. Повторный вызов ничего не делает:
+        у префиксных команд при ошибке срабатывают и after_invoke, и
+        on_command_error, а у гибридных при слэш-вызове — только второй."""
+        if self.metrics_started is None or self._metrics_recorded or self.command is None:
+            return
+        self._metrics_recorded = True
+        metrics.commands.observe(self.command.qualified_name, time.perf_counter() - self.metrics_started, failed)
+
+    def start_auto_defer(self, budget: float):
+        if self.interaction is None or budget <= 0 or self._auto_defer_task is not None:
+            return
+        self._auto_defer_task = asyncio.create_task(self._auto_defer(budget))
+
+    def stop_auto_defer(self):
+        """Отменяет ожидание автоматического defer. Уже отправленный defer
+        не прерывается: он держит блокировку ответа, и следующий ctx.send
+        дождётся его и уйдёт в followup."""
+        if self._auto_defer_task is not None:
+            self._auto_defer_task.cancel()
+
+    async def _auto_defer(self, budget: float):
+        await asyncio.sleep(max(0.0, budget - self._since_created()))
+        await asyncio.shield(self._defer_now())
+
+    async def _defer_now(self):
+        async with self._response_lock:
+            if self.interaction.response.is_done():
+                return
+            try:
+                await super().defer()
+            except discord.HTTPException as e:
+                logger.warning(f"Auto-defer of /{self.command} failed: {e!r}")
+                return
+            self.auto_deferred = self._deferred = True
+        self._mark_response()
+        logger.info(f"/{self.command} auto-deferred after {self.first_response_after:.2f}s")
+
+    async def defer(self, *, ephemeral: bool = False):
+        if self.interaction is not None and self.interaction.response.is_done():
+            # Уже подтверждено (например, автоматическим defer).
+            return
+        async with self._response_lock:
+            if self.interaction is None or not self.interaction.response.is_done():
+                await super().defer(ephemeral=ephemeral)
+                self._deferred = True
+        self._mark_response()
+
+    async def send(self, *args, **kwargs):
+        if self.interaction is None or self.first_response_after is not None:
+            message = await super().send(*args, **kwargs)
+        else:
+            async with self._response_lock:
+                message = await super().send(*args, **kwargs)
+            self._mark_response()
+        self._replied = True
+        return message
+
+    async def finish_response(self):
+        """Отвечает на интеракцию, если команда не ответила через ctx.send:
+        без ответа Discord покажет «The application did not respond», а
+        после defer — вечное «думает…». Ответы мимо ctx (например, прямой
+        interaction.response) не трогаются."""
+        if self.interaction is None or self._replied:
+            return
+        async with self._response_lock:
+            try:
+                if not self.interaction.response.is_done():
+                    await self.interaction.response.send_message(embed=e_ok("Готово"), ephemeral=True)
+                elif self._deferred:
+                    await self.interaction.followup.send(embed=e_ok("Готово"))
+                else:
+                    return
+            except discord.HTTPException as e:
+                logger.warning(f"Closing the interaction of /{self.command} failed: {e!r}")
+                return
+        self._replied = True
+        self._mark_response()
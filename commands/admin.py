@@ -1,15 +1,16 @@
-"""Административные команды: adminmenu, getvideosid, check_yt, testyt, spamtest, bomb, defuse."""
+"""Административные команды: adminmenu, getvideosid, check_yt, testyt, ytchannels, ytadd, ytremove, spamtest, reloadpatterns, reload, sync, stalls, bomb, defuse."""
 
 import asyncio
 import random
+import time
+from datetime import timedelta
 
 import discord
 from discord.ext import commands
 
-from config import MUTE_ROLE_ID
+from config import MUTE_ROLE_ID, PATTERNS_FILE, BLOCK_INVITES
 from moderation_core import is_admin
 from views import AdminMenuView, ConfirmView
-from youtube import fetch_and_save_latest_video_ids, check_youtube_channels
 from antispam import (
     user_message_log,
     last_spam_alert,
@@ -21,12 +22,29 @@ from database import (
     get_bomb_cooldown,
     set_bomb_cooldown,
     remove_bomb_cooldown,
+    write_queue,
 )
 from embeds import e_ok, e_err, e_info, e_warn
+from tasks import job_scheduler
+from bulk_roles import bulk_update_role
+import patterns
+import state_store
+from state_store import TTLCache
 from moderation_core import seconds_to_human, _utcnow
 
 # Состояние бомбы: guild_id -> {'number': int, 'end_time': datetime, 'task': Task}
-bomb_info: dict[int, dict] = {}
+# Бомба живёт час; запись переживает таймер с запасом и затем вытесняется.
+bomb_info: TTLCache = TTLCache("admin.bomb_info", maxsize=1000, ttl=2 * 3600)
+
+
+def _reload_report(results: list[tuple[str, float, Exception | None]]) -> discord.Embed:
+    lines = [
+        f"`{name}` — {ms:.0f} мс" if error is None else f"`{name}` — ошибка: {str(error)[:200]}"
+        for name, ms, error in results
+    ]
+    if any(error for _, _, error in results):
+        return e_err("Перезагрузка модулей", "\n".join(lines))
+    return e_ok("Модули перезагружены", "\n".join(lines))
 
 
 def register(bot):
@@ -35,77 +53,168 @@ def register(bot):
     @commands.check(lambda ctx: is_admin(ctx.author))
     async def adminmenu(ctx: commands.Context):
         """Открыть панель администратора."""
+        from youtube import key_manager, etag_stats
+
         embed = discord.Embed(
             title="Панель администратора",
             description=(
                 "**Проверить YouTube каналы** — вручную запустить проверку новых видео.\n"
                 "**Обновить ID последних видео** — сохранить ID текущих последних роликов.\n"
-                "**Перезагрузить бота** — безопасно перезапустить процесс."
+                "**Перезагрузить модули** — применить новый код команд без переподключения к Discord."
             ),
             color=discord.Color.gold(),
         )
+        db = write_queue.stats()
+        embed.add_field(
+            name="Очередь записи БД",
+            value=f"В очереди: `{db['depth']}` · коммитов: `{db['commits']}` · средний коммит: `{db['avg_commit_ms']}` мс",
+            inline=False,
+        )
+        caches = state_store.stats()
+        embed.add_field(
+            name="Кэши состояния",
+            value="\n".join(
+                f"`{name}`: {st['size']}/{st['maxsize']} · вытеснено {st['evictions']} · истекло {st['expirations']}"
+                for name, st in sorted(caches.items())
+            ) or "—",
+            inline=False,
+        )
+        budget = await key_manager.budget()
+        embed.add_field(
+            name="Квота YouTube (сутки PT)",
+            value="\n".join(
+                f"`{b['key']}`: осталось {b['remaining']}/{key_manager.daily_quota}"
+                + (" · исчерпан" if b['exhausted'] else "")
+                for b in budget
+            ) or "—",
+            inline=False,
+        )
+        etags = etag_stats()
+        embed.add_field(
+            name="Условные запросы YouTube",
+            value=f"Без изменений (304): `{etags['not_modified']}` из `{etags['conditional']}` · hit rate `{etags['hit_rate']:.0%}`",
+            inline=False,
+        )
         await ctx.send(embed=embed, view=AdminMenuView())
 
     @bot.hybrid_command(with_app_command=True)
     @commands.check(lambda ctx: is_admin(ctx.author))
     async def getvideosid(ctx: commands.Context):
         """Обновить ID последних видео на YouTube-каналах."""
-        await fetch_and_save_latest_video_ids()
+        from youtube import fetch_and_save_latest_video_ids, YouTubeQuotaExhausted
+
+        try:
+            await fetch_and_save_latest_video_ids()
+        except YouTubeQuotaExhausted as e:
+            await ctx.send(embed=e_err("Квота YouTube исчерпана", f"{e}\nПовторите после сброса квоты."))
+            return
+        except Exception as e:
+            await ctx.send(embed=e_err("Ошибка YouTube API", str(e)[:200]))
+            return
         await ctx.send(embed=e_ok("Готово", "ID последних видео обновлены."))
 
     @bot.hybrid_command(with_app_command=True)
     @commands.check(lambda ctx: is_admin(ctx.author))
     async def check_yt(ctx: commands.Context):
         """Вручную проверить YouTube-каналы на новые видео."""
-        await check_youtube_channels(reply_channel=ctx.channel, bot=ctx.bot)
+        from youtube import check_youtube_channels
+
+        await check_youtube_channels(reply_channel=ctx, bot=ctx.bot)
 
     @bot.hybrid_command(with_app_command=True)
     @commands.check(lambda ctx: is_admin(ctx.author))
-    async def testyt(ctx: commands.Context, channel_index: int = 1):
-        """Протестировать уведомление о видео (отправит в текущий канал)."""
-        from youtube import _get_youtube_service, _send_video_notification
-        from config import (
-            YOUTUBE_API_KEYS,
-            YOUTUBE_CHANNEL_ID_1,
-            YOUTUBE_CHANNEL_ID_2,
+    async def testyt(ctx: commands.Context, channel: str = "1"):
+        """Протестировать уведомление о видео (отправит в текущий канал). Номер из ytchannels или ID канала."""
+        from youtube import (
+            _send_video_notification,
+            _latest_upload_ids,
+            _video_details,
+            _render_message,
+            load_channels,
+            YouTubeQuotaExhausted,
         )
 
-        yt_configs = {
-            1: (YOUTUBE_CHANNEL_ID_1, "<@&1104385788797534228>", "На канале какая-то движуха. А ну-ка глянем"),
-            2: (YOUTUBE_CHANNEL_ID_2, "<@&1265571159601319989>", "На втором канате что-то появилось. Давайте-ка заценим"),
-        }
-        if channel_index not in yt_configs:
-            await ctx.send(embed=e_err("Ошибка", "Укажите 1 или 2."))
+        channels = list((await load_channels()).values())
+        if channel.isdigit() and 1 <= int(channel) <= len(channels):
+            cfg = channels[int(channel) - 1]
+        else:
+            cfg = next((c for c in channels if c["channel_id"] == channel), None)
+        if cfg is None:
+            await ctx.send(embed=e_err("Ошибка", f"Укажите номер от 1 до {len(channels)} или ID канала из ytchannels."))
+            return
+
+        ch_id = cfg["channel_id"]
+        try:
+            latest = await _latest_upload_ids(ch_id)
+            item = (await _video_details(latest)).get(latest[0]) if latest else None
+        except YouTubeQuotaExhausted as e:
+            await ctx.send(embed=e_err("Квота YouTube исчерпана", str(e)))
+            return
+        except Exception as e:
+            await ctx.send(embed=e_err("Ошибка YouTube API", str(e)[:200]))
+            return
+
+        if item:
+            await _send_video_notification(ctx.channel, ch_id, item, _render_message(cfg["message"], item), cfg["mention"])
+            await ctx.send(embed=e_ok("Тест выполнен", "Уведомление отправлено выше."), ephemeral=True)
+        else:
+            await ctx.send(embed=e_err("Ошибка", "Не найдено видео на канале."))
+
+    @bot.hybrid_command(with_app_command=True)
+    @commands.check(lambda ctx: is_admin(ctx.author))
+    async def ytchannels(ctx: commands.Context):
+        """Список отслеживаемых YouTube-каналов."""
+        from youtube import load_channels
+
+        channels = list((await load_channels()).values())
+        if not channels:
+            await ctx.send(embed=e_info("YouTube-каналы", "Список пуст. Добавьте канал командой ytadd."))
+            return
+        lines = []
+        for i, c in enumerate(channels, 1):
+            target = f"<#{c['notify_channel_id']}>" if c['notify_channel_id'] else "канал по умолчанию"
+            mention = f" · {c['mention']}" if c['mention'] else ""
+            lines.append(f"**{i}.** `{c['channel_id']}` → {target}{mention}")
+        await ctx.send(embed=e_info("YouTube-каналы", "\n".join(lines)[:4000]))
+
+    @bot.hybrid_command(with_app_command=True)
+    @commands.check(lambda ctx: is_admin(ctx.author))
+    async def ytadd(
+        ctx: commands.Context,
+        channel_id: str,
+        notify_channel: discord.TextChannel = None,
+        role: discord.Role = None,
+        *,
+        message: str = "Новое видео на канале {channel}!",
+    ):
+        """Добавить YouTube-канал (или изменить его настройки). В тексте доступны {title}, {url}, {channel}."""
+        from youtube import add_channel, YouTubeQuotaExhausted
+
+        try:
+            await add_channel(
+                channel_id,
+                notify_channel.id if notify_channel else None,
+                role.mention if role else "",
+                message,
+            )
+        except ValueError:
+            await ctx.send(embed=e_err("Ошибка", f"Канал `{channel_id}` не найден на YouTube."))
             return
+        except YouTubeQuotaExhausted as e:
+            await ctx.send(embed=e_err("Квота YouTube исчерпана", str(e)))
+            return
+        await ctx.send(embed=e_ok("Канал добавлен", f"`{channel_id}` теперь отслеживается."))
 
-        ch_id, mention, text = yt_configs[channel_index]
-        sent = False
-
-        for api_key in YOUTUBE_API_KEYS:
-            youtube = _get_youtube_service(api_key)
-            try:
-                req = youtube.search().list(part="snippet", channelId=ch_id, order="date", maxResults=1)
-                resp = req.execute()
-                if resp.get('items'):
-                    item = resp['items'][0]
-                    if item['id']['kind'] != 'youtube#video':
-                        await ctx.send(embed=e_err("Ошибка", "Последний элемент не является видео."))
-                        return
-                    await _send_video_notification(ctx.channel, ch_id, item, text, mention)
-                    await ctx.send(embed=e_ok("Тест выполнен", "Уведомление отправлено выше."), ephemeral=True)
-                    sent = True
-                else:
-                    await ctx.send(embed=e_err("Ошибка", "Не найдено видео на канале."))
-                break
-            except Exception as e:
-                if 'quotaExceeded' in str(e):
-                    continue
-                else:
-                    await ctx.send(embed=e_err("Ошибка YouTube API", str(e)[:200]))
-                    return
-
-        if not sent:
-            await ctx.send(embed=e_err("Ошибка", "Не удалось получить видео. Возможно, лимит API исчерпан."))
+    @bot.hybrid_command(with_app_command=True)
+    @commands.check(lambda ctx: is_admin(ctx.author))
+    async def ytremove(ctx: commands.Context, channel_id: str):
+        """Перестать отслеживать YouTube-канал."""
+        from youtube import remove_channel
+
+        if await remove_channel(channel_id):
+            await ctx.send(embed=e_ok("Канал удалён", f"`{channel_id}` больше не отслеживается."))
+        else:
+            await ctx.send(embed=e_err("Ошибка", f"Канал `{channel_id}` не найден в списке."))
 
     @bot.hybrid_command(with_app_command=True)
     @commands.check(lambda ctx: is_admin(ctx.author))
@@ -114,10 +223,10 @@ def register(bot):
         trigger = trigger.lower().strip()
         if trigger in ("multichannel", "channels"):
             fake_channels = list(range(SPAM_CHANNELS_THRESHOLD))
-            now = _utcnow()
-            log = user_message_log[ctx.author.id]
+            now = time.time()
+            window = user_message_log[ctx.author.id]
             for ch_id in fake_channels:
-                log.append((now, ch_id))
+                window.push(now, ch_id)
             last_spam_alert.pop(ctx.author.id, None)
             await send_spam_alert(
                 user=ctx.author,
@@ -138,10 +247,66 @@ def register(bot):
         else:
             await ctx.send(embed=e_err("Неизвестный тип", "Доступно: `multichannel`, `everyone`"))
 
+    @bot.hybrid_command(with_app_command=True)
+    @commands.check(lambda ctx: is_admin(ctx.author))
+    async def reloadpatterns(ctx: commands.Context):
+        """Перечитать файл запрещённых фраз и доменов."""
+        counts = await asyncio.to_thread(patterns.load_patterns, PATTERNS_FILE, invites=BLOCK_INVITES)
+        await ctx.send(embed=e_ok(
+            "Шаблоны перезагружены",
+            f"Фраз: **{counts['phrase']}** · доменов: **{counts['domain']}** · "
+            f"инвайты: **{'да' if BLOCK_INVITES else 'нет'}**",
+        ))
+
+    @bot.hybrid_command(name="reload", with_app_command=True)
+    @commands.check(lambda ctx: is_admin(ctx.author))
+    async def reload_cmd(ctx: commands.Context, extension: str = "all"):
+        """Перезагрузить модуль команд (admin, moderation, fun, subscribe, help, events) или все сразу."""
+        names = None if extension == "all" else [extension]
+        try:
+            results = await ctx.bot.reload_modules(names)
+        except KeyError:
+            await ctx.send(embed=e_err("Ошибка", f"Неизвестный модуль `{extension}`."))
+            return
+        await ctx.send(embed=_reload_report(results))
+
+    @bot.hybrid_command(with_app_command=True)
+    @commands.check(lambda ctx: is_admin(ctx.author))
+    async def sync(ctx: commands.Context):
+        """Принудительно синхронизировать слэш-команды с Discord."""
+        started = time.perf_counter()
+        await ctx.bot.sync_tree(force=True)
+        await ctx.send(embed=e_ok(
+            "Команды синхронизированы",
+            f"За {(time.perf_counter() - started) * 1000:.0f} мс. "
+            f"Пропущено синхронизаций с запуска: {ctx.bot.syncs_skipped}.",
+        ))
+
+    @bot.hybrid_command(with_app_command=True)
+    @commands.check(lambda ctx: is_admin(ctx.author))
+    async def stalls(ctx: commands.Context, count: int = 3):
+        """Последние зависания event loop со стеком блокирующего вызова."""
+        import loop_watchdog
+
+        reports = loop_watchdog.recent(max(1, min(count, 10)))
+        if not reports:
+            await ctx.send(embed=e_info("Зависания event loop", "Зависаний не зафиксировано."))
+            return
+        embed = discord.Embed(title="Зависания event loop", color=discord.Color.orange())
+        for report in reversed(reports):
+            # Внизу стека — сам блокирующий вызов; он важнее всего.
+            stack = "".join(report.stack[-6:]).replace("```", "`\u200b``")[-1000:]
+            embed.add_field(
+                name=f"{report.started_at:%H:%M:%S} UTC · {report.duration * 1000:.0f} мс",
+                value=f"```{stack or 'стек недоступен'}```",
+                inline=False,
+            )
+        await ctx.send(embed=embed)
+
     @bot.hybrid_command(name="bomb", with_app_command=True)
     async def bomb(ctx: commands.Context):
         """Заложить бомбу."""
-        cooldown_end = get_bomb_cooldown(ctx.guild.id)
+        cooldown_end = await get_bomb_cooldown(ctx.guild.id)
         if cooldown_end and _utcnow() < cooldown_end:
             time_left = int((cooldown_end - _utcnow()).total_seconds())
             await ctx.send(embed=e_err(
@@ -156,7 +321,7 @@ def register(bot):
         await view.wait()
 
         if not view.value:
-            remove_bomb_cooldown(ctx.guild.id)
+            await remove_bomb_cooldown(ctx.guild.id)
             if view.value is False:
                 await ctx.send(embed=e_info("Отменено", "Действие отменено."))
             else:
@@ -169,9 +334,9 @@ def register(bot):
 
         bomb_info[ctx.guild.id] = {
             'number': number,
-            'end_time': _utcnow() + __import__('datetime', fromlist=['timedelta']).timedelta(hours=1),
+            'end_time': _utcnow() + timedelta(hours=1),
         }
-        set_bomb_cooldown(ctx.guild.id, _utcnow() + __import__('datetime', fromlist=['timedelta']).timedelta(days=7))
+        await set_bomb_cooldown(ctx.guild.id, _utcnow() + timedelta(days=7))
 
         embed = discord.Embed(
             title="Bomb has been planted.",
@@ -197,9 +362,15 @@ def register(bot):
                 role = discord.utils.get(ctx.guild.roles, id=MUTE_ROLE_ID)
                 if role:
                     members = [m for m in ctx.channel.members if m != ctx.guild.me and not m.guild_permissions.administrator and m.id != ctx.author.id]
-                    await asyncio.gather(*[m.add_roles(role, reason="Бомба взорвалась") for m in members])
-                    await asyncio.sleep(3600)
-                    await asyncio.gather(*[m.remove_roles(role, reason="Время мьюта истекло") for m in members])
+                    status = await ctx.send(embed=e_info("Взрыв", f"Мьючу {len(members)} участников…"))
+                    result = await bulk_update_role(members, role, add=True, reason="Бомба взорвалась", status_message=status)
+                    if result.succeeded:
+                        await job_scheduler.schedule(
+                            "remove_role", _utcnow() + timedelta(hours=1),
+                            guild_id=ctx.guild.id, role_id=role.id, user_ids=[m.id for m in result.succeeded],
+                            reason="Время мьюта истекло",
+                        )
+                    await status.edit(embed=e_warn("Взрыв", f"{result.summary()}."))
 
         bomb_info[ctx.guild.id]['task'] = asyncio.create_task(bomb_timer())
 
@@ -221,3 +392,16 @@ def register(bot):
             await ctx.send(embed=embed)
         else:
             await ctx.send(embed=e_err("Неверный код", "Попробуйте ещё раз!"))
+
+
+async def setup(bot):
+    # Состояние бомб переживает горячую перезагрузку модуля.
+    global bomb_info
+    saved = bot.extension_state.pop(__name__, None)
+    if saved:
+        bomb_info = saved["bomb_info"]
+    register(bot)
+
+
+async def teardown(bot):
+    bot.extension_state[__name__] = {"bomb_info": bomb_info}
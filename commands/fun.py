@@ -1,13 +1,23 @@
 """Развлекательные команды: MrCarsen, золотойфонд, рулетка, ХУЯБЛЯ и др."""
 
-import asyncio
 import random
+from datetime import timedelta
 
 import discord
 from discord.ext import commands
 
 from config import MUTE_ROLE_ID
 from randomlist import mr_carsen_messages, gold_fund_messages
+from embeds import _utcnow
+from tasks import job_scheduler
+
+
+async def _schedule_unmute(ctx: commands.Context, role: discord.Role, seconds: int = 60):
+    await job_scheduler.schedule(
+        "remove_role", _utcnow() + timedelta(seconds=seconds),
+        guild_id=ctx.guild.id, role_id=role.id, user_ids=[ctx.author.id],
+        reason="Время мьюта истекло",
+    )
 
 
 def register(bot):
@@ -38,8 +48,7 @@ def register(bot):
         role = discord.utils.get(ctx.guild.roles, id=MUTE_ROLE_ID)
         if role and not ctx.author.guild_permissions.administrator:
             await ctx.author.add_roles(role, reason="Допизделся, дядя!")
-            await asyncio.sleep(60)
-            await ctx.author.remove_roles(role, reason="Время мьюта истекло")
+            await _schedule_unmute(ctx, role)
 
     @bot.command(name="рулетка")
     async def roulette(ctx: commands.Context):
@@ -48,9 +57,12 @@ def register(bot):
             role = discord.utils.get(ctx.guild.roles, id=MUTE_ROLE_ID)
             if role and not ctx.author.guild_permissions.administrator:
                 await ctx.author.add_roles(role, reason="Русская рулетка")
-                await asyncio.sleep(60)
-                await ctx.author.remove_roles(role, reason="Время мьюта истекло")
+                await _schedule_unmute(ctx, role)
             else:
                 pass  # admin
         else:
             await ctx.reply("**·щёлк·**\nФартовый однако!")
+
+
+async def setup(bot):
+    register(bot)
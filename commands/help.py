@@ -53,3 +53,7 @@ def register(bot):
         embeds_list.append(fun_embed)
 
         await interaction.response.send_message(embeds=embeds_list, ephemeral=True)
+
+
+async def setup(bot):
+    register(bot)
@@ -1,7 +1,6 @@
 """Команды модерации: mute, unmute, ban, warn, warnings, warnremove, mute_all."""
 
-import asyncio
-from datetime import datetime
+from datetime import timedelta
 
 import discord
 from discord import app_commands
@@ -15,6 +14,7 @@ from moderation_core import (
     parse_duration,
     apply_mute,
     apply_warn,
+    _utcnow,
 )
 from database import (
     remove_mute,
@@ -22,6 +22,8 @@ from database import (
     remove_warnings,
 )
 from embeds import e_err, e_ok, e_warn, e_info, send_mod_log, LOG_COLORS
+from tasks import mute_scheduler, job_scheduler
+from bulk_roles import bulk_update_role
 
 
 def register(bot):
@@ -51,7 +53,8 @@ def register(bot):
         role = discord.utils.get(ctx.guild.roles, id=MUTE_ROLE_ID)
         if role and role in member.roles:
             await member.remove_roles(role, reason="Ручной анмьют")
-            remove_mute(member.id)
+            await remove_mute(member.id)
+            mute_scheduler.cancel(member.id)
             embed = e_ok("Мут снят", f"{member.mention} был размьючен модератором {ctx.author.mention}.")
             embed.set_thumbnail(url=member.display_avatar.url)
             embed.set_footer(text=f"ID: {member.id}")
@@ -131,8 +134,8 @@ def register(bot):
         if not can:
             await ctx.send(embed=e_err("Нет прав", why))
             return
-        if get_warnings(member.id):
-            remove_warnings(member.id)
+        if await get_warnings(member.id):
+            await remove_warnings(member.id)
             embed = e_ok("Предупреждения сняты", f"Все предупреждения {member.mention} удалены.")
             embed.set_thumbnail(url=member.display_avatar.url)
             embed.add_field(name="Модератор", value=ctx.author.mention, inline=True)
@@ -145,7 +148,7 @@ def register(bot):
     @commands.check(lambda ctx: is_admin_or_moderator(ctx.author))
     async def warnings(ctx: commands.Context, member: discord.Member):
         """Показать предупреждения участника."""
-        warnings_list = get_warnings(member.id)
+        warnings_list = await get_warnings(member.id)
         if warnings_list:
             embed = e_warn(
                 f"Предупреждения — {member.display_name}",
@@ -154,7 +157,7 @@ def register(bot):
             embed.set_thumbnail(url=member.display_avatar.url)
             embed.set_footer(text=f"ID: {member.id}")
             for i, w in enumerate(reversed(warnings_list), 1):
-                ts = datetime.fromisoformat(w['timestamp']).strftime('%d.%m.%Y %H:%M UTC')
+                ts = w['timestamp'].strftime('%d.%m.%Y %H:%M UTC')
                 embed.add_field(name=f"#{i} · {ts}", value=w['reason'], inline=False)
             await ctx.send(embed=embed)
         else:
@@ -169,8 +172,20 @@ def register(bot):
             await ctx.send(embed=e_err("Роль мьюта не найдена"))
             return
         members = [m for m in ctx.channel.members if m != ctx.guild.me and not m.guild_permissions.administrator and m.id != ctx.author.id]
-        await asyncio.gather(*[m.add_roles(role, reason=reason) for m in members])
-        await ctx.send(embed=e_warn("Массовый мут", f"Замьючено участников: **{len(members)}**. Мут снимется через 1 час."))
-        await asyncio.sleep(3600)
-        await asyncio.gather(*[m.remove_roles(role, reason="Время мьюта истекло") for m in members])
-        await ctx.send(embed=e_ok("Массовый мут снят", "Все участники размьючены."))
+        status = await ctx.send(embed=e_info("Массовый мут", f"Выдаю роль мьюта {len(members)} участникам…"))
+        result = await bulk_update_role(members, role, add=True, reason=reason, status_message=status)
+        if result.succeeded:
+            await job_scheduler.schedule(
+                "remove_role", _utcnow() + timedelta(hours=1),
+                guild_id=ctx.guild.id, role_id=role.id, user_ids=[m.id for m in result.succeeded],
+                reason="Время мьюта истекло",
+                channel_id=ctx.channel.id, notice=["Массовый мут снят", "Все участники размьючены."],
+            )
+        embed = e_warn("Массовый мут", f"{result.summary()}. Мут снимется через 1 час.")
+        if result.failed:
+            embed.add_field(name="Не удалось замьютить", value=result.failed_details(), inline=False)
+        await status.edit(embed=embed)
+
+
+async def setup(bot):
+    register(bot)
@@ -40,3 +40,7 @@ def register(bot):
             color=role.color,
         )
         await ctx.send(embed=embed, view=SubscribeView(SEC_YT_SUBSCRIBER_ROLE_ID))
+
+
+async def setup(bot):
+    register(bot)
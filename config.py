@@ -22,6 +22,27 @@ GUILD_ID = int(os.getenv("GUILD_ID"))
 YOUTUBE_API_KEYS = [k.strip('"') for k in os.getenv("YOUTUBE_API_KEYS").split(',')]
 YOUTUBE_CHANNEL_ID_1 = os.getenv("YOUTUBE_CHANNEL_ID_1")
 YOUTUBE_CHANNEL_ID_2 = os.getenv("YOUTUBE_CHANNEL_ID_2")
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+YOUTUBE_POLL_INTERVAL = int(os.getenv("YOUTUBE_POLL_INTERVAL", "900"))
+
+# Метрики Prometheus (GET /metrics); 0 — выключены
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Слэш-команда, не ответившая за столько секунд, подтверждается defer()
+# автоматически (лимит Discord — 3 с); 0 — выключено
+AUTO_DEFER_AFTER = float(os.getenv("AUTO_DEFER_AFTER", "2.0"))
+
+# Сторож event loop: порог зависания в секундах; 0 — выключен
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.25"))
+
+# WebSub (push-уведомления YouTube); без WEBSUB_CALLBACK_URL выключен
+WEBSUB_CALLBACK_URL = os.getenv("WEBSUB_CALLBACK_URL", "")
+WEBSUB_HOST = os.getenv("WEBSUB_HOST", "0.0.0.0")
+WEBSUB_PORT = int(os.getenv("WEBSUB_PORT", "8080"))
+WEBSUB_SECRET = os.getenv("WEBSUB_SECRET", "")
+WEBSUB_HUB_URL = os.getenv("WEBSUB_HUB_URL", "https://pubsubhubbub.appspot.com/subscribe")
+WEBSUB_LEASE_SECONDS = int(os.getenv("WEBSUB_LEASE_SECONDS", "432000"))
 
 # Anti-spam
 SPAM_TIME_WINDOW = int(os.getenv("SPAM_TIME_WINDOW", "120"))
@@ -29,5 +50,20 @@ SPAM_CHANNELS_THRESHOLD = int(os.getenv("SPAM_CHANNELS_THRESHOLD", "3"))
 SPAM_ALERT_COOLDOWN = 300
 NEW_ACCOUNT_DAYS_THRESHOLD = int(os.getenv("NEW_ACCOUNT_DAYS_THRESHOLD", "14"))
 
+# Banned content
+PATTERNS_FILE = os.getenv("PATTERNS_FILE", "banned_patterns.txt")
+BLOCK_INVITES = os.getenv("BLOCK_INVITES", "1").lower() in ("1", "true", "yes")
+
+# Duplicate messages (copy-paste campaigns)
+DUPLICATE_WINDOW = int(os.getenv("DUPLICATE_WINDOW", "600"))
+DUPLICATE_CHANNELS_THRESHOLD = int(os.getenv("DUPLICATE_CHANNELS_THRESHOLD", "3"))
+DUPLICATE_SIMILARITY = float(os.getenv("DUPLICATE_SIMILARITY", "0.7"))
+DUPLICATE_MIN_LENGTH = int(os.getenv("DUPLICATE_MIN_LENGTH", "30"))
+
+# Join raid
+RAID_JOIN_WINDOW = int(os.getenv("RAID_JOIN_WINDOW", "60"))
+RAID_JOIN_THRESHOLD = int(os.getenv("RAID_JOIN_THRESHOLD", "10"))
+RAID_QUARANTINE = os.getenv("RAID_QUARANTINE", "0").lower() in ("1", "true", "yes")
+
 # Database
 DB_FILE = os.getenv("DB_FILE", "bot_data.db")
@@ -1,58 +1,387 @@
-"""Работа с базой данных: подключение, создание таблиц, CRUD-функции."""
+"""Работа с базой данных: подключение, создание таблиц, CRUD-функции.
 
+Все обращения к SQLite выполняются в отдельном потоке, который владеет
+единственным долгоживущим соединением. Публичные CRUD-функции — корутины,
+поэтому event loop не блокируется дисковым I/O.
+"""
+
+import asyncio
+import functools
+import json
 import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from logging import getLogger
+
+import metrics
+from config import DB_FILE, YOUTUBE_CHANNEL_ID_1, YOUTUBE_CHANNEL_ID_2
 
-from config import DB_FILE
+logger = getLogger(__name__)
 
 
 # ─── Connection ───────────────────────────────────────────────────────────
 
+# Один поток — одно соединение: sqlite3 кэширует подготовленные выражения
+# на уровне соединения, поэтому одинаковые SQL-строки компилируются один раз.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+_conn: sqlite3.Connection | None = None
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_FILE, cached_statements=256)
+        # journal_mode нельзя менять внутри транзакции, а synchronous
+        # действует только на текущее соединение — поэтому не в миграциях.
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+    return _conn
+
+
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_FILE)
+    """Транзакция на общем соединении. Использовать только в потоке БД."""
+    conn = _connect()
     try:
         yield conn
         conn.commit()
-    finally:
-        conn.close()
-
-
-# ─── Tables ───────────────────────────────────────────────────────────────
-
-def create_tables():
-    with get_db() as conn:
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS warnings (
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _db_call(func):
+    """Превращает синхронную функцию работы с БД в корутину, выполняемую в потоке БД."""
+    @metrics.timed(metrics.db, func.__name__)
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        # Поток БД выполняет задания по порядку: отправив накопленные
+        # отложенные записи первыми, чтение гарантированно их увидит.
+        write_queue.dispatch()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+    return wrapper
+
+
+def _run_sync(func, *args):
+    """Выполняет функцию в потоке БД и дожидается результата (вне event loop)."""
+    return _executor.submit(func, *args).result()
+
+
+def close_db():
+    def _close():
+        global _conn
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+    _run_sync(_close)
+
+
+# ─── Write-behind queue ──────────────────────────────────────────────────
+
+def _write_batch(rows: list[tuple[str, tuple]]) -> tuple[float, dict[int, Exception]]:
+    """Записывает пачку одной транзакцией. При ошибке повторяет построчно,
+    чтобы одна битая строка не откатила остальные."""
+    conn = _connect()
+    started = time.perf_counter()
+    errors: dict[int, Exception] = {}
+    try:
+        with get_db():
+            for sql, params in rows:
+                conn.execute(sql, params)
+    except sqlite3.Error:
+        for i, (sql, params) in enumerate(rows):
+            try:
+                with get_db():
+                    conn.execute(sql, params)
+            except sqlite3.Error as e:
+                errors[i] = e
+    return (time.perf_counter() - started) * 1000, errors
+
+
+class WriteQueue:
+    """Отложенная запись: собирает INSERT/UPDATE из разных корутин и коммитит
+    их одной транзакцией раз в `interval` секунд или по `batch_size` строк."""
+
+    def __init__(self, interval: float = 0.05, batch_size: int = 200):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._pending: list[tuple[str, tuple, asyncio.Future | None]] = []
+        self._inflight: set[asyncio.Future] = set()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.commits = 0
+        self.rows = 0
+        self.failed_rows = 0
+        self.last_commit_ms = 0.0
+        self.max_commit_ms = 0.0
+        self._total_commit_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    async def write(self, sql: str, params: tuple = (), *, durable: bool = False):
+        """Ставит запись в очередь. С durable=True ждёт, пока транзакция
+        будет закоммичена, и пробрасывает ошибку записи."""
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future() if durable else None
+        self._pending.append((sql, params, waiter))
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        if len(self._pending) >= self.batch_size:
+            self.dispatch()
+        else:
+            self._wakeup.set()
+        if waiter is not None:
+            await waiter
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.interval)
+            self._wakeup.clear()
+            self.dispatch()
+
+    def dispatch(self):
+        """Отправляет накопленное в поток БД, не дожидаясь коммита."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(_executor, _write_batch, [(sql, params) for sql, params, _ in batch])
+        self._inflight.add(fut)
+        fut.add_done_callback(functools.partial(self._on_committed, batch))
+
+    def _on_committed(self, batch: list, fut: asyncio.Future):
+        self._inflight.discard(fut)
+        if fut.cancelled():
+            errors = {i: asyncio.CancelledError() for i in range(len(batch))}
+        elif fut.exception() is not None:
+            errors = {i: fut.exception() for i in range(len(batch))}
+        else:
+            elapsed_ms, errors = fut.result()
+            self.commits += 1
+            self.last_commit_ms = elapsed_ms
+            self.max_commit_ms = max(self.max_commit_ms, elapsed_ms)
+            self._total_commit_ms += elapsed_ms
+
+        self.rows += len(batch) - len(errors)
+        self.failed_rows += len(errors)
+        for i, (sql, _, waiter) in enumerate(batch):
+            exc = errors.get(i)
+            if waiter is not None and not waiter.done():
+                if exc is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(exc)
+            elif exc is not None:
+                logger.error(f"Write-behind row failed: {sql!r}: {exc!r}")
+
+    async def flush(self):
+        """Коммитит всё накопленное и дожидается завершения."""
+        self.dispatch()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "inflight": len(self._inflight),
+            "commits": self.commits,
+            "rows": self.rows,
+            "failed_rows": self.failed_rows,
+            "last_commit_ms": round(self.last_commit_ms, 2),
+            "avg_commit_ms": round(self._total_commit_ms / self.commits, 2) if self.commits else 0.0,
+            "max_commit_ms": round(self.max_commit_ms, 2),
+        }
+
+
+write_queue = WriteQueue()
+
+
+# ─── Migrations ──────────────────────────────────────────────────────────
+# Версия схемы хранится в PRAGMA user_version. Каждая миграция выполняется
+# в своей транзакции вместе с обновлением версии; порядок в списке менять
+# нельзя, новые миграции добавляются только в конец.
+
+def _m001_base_tables(conn: sqlite3.Connection):
+    conn.execute('''CREATE TABLE IF NOT EXISTS warnings (
                       user_id   INTEGER,
                       timestamp TEXT,
                       reason    TEXT
                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS mutes (
+    conn.execute('''CREATE TABLE IF NOT EXISTS mutes (
                       user_id  INTEGER UNIQUE,
                       end_time TEXT,
                       reason   TEXT
                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS bomb_cooldowns (
+    conn.execute('''CREATE TABLE IF NOT EXISTS bomb_cooldowns (
                       guild_id INTEGER PRIMARY KEY,
                       end_time TEXT
                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS last_video_ids (
+    conn.execute('''CREATE TABLE IF NOT EXISTS last_video_ids (
                       channel_id TEXT PRIMARY KEY,
                       video_id   TEXT
                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS video_history (
+    conn.execute('''CREATE TABLE IF NOT EXISTS video_history (
                       channel_id TEXT,
                       video_id   TEXT,
                       PRIMARY KEY (channel_id, video_id)
                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS role_users (
+    conn.execute('''CREATE TABLE IF NOT EXISTS role_users (
                       user_id INTEGER PRIMARY KEY,
                       role_id INTEGER
                    )''')
 
 
+def _iso_to_epoch(value) -> int:
+    if isinstance(value, int):
+        return value
+    try:
+        return dt_to_epoch(dt_from_iso(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _m002_epoch_timestamps(conn: sqlite3.Connection):
+    """ISO-строки времени → целые UNIX-секунды."""
+    rows = conn.execute("SELECT user_id, timestamp, reason FROM warnings").fetchall()
+    conn.execute("DROP TABLE warnings")
+    conn.execute('''CREATE TABLE warnings (
+                      user_id   INTEGER NOT NULL,
+                      timestamp INTEGER NOT NULL,
+                      reason    TEXT
+                   )''')
+    conn.executemany(
+        "INSERT INTO warnings (user_id, timestamp, reason) VALUES (?, ?, ?)",
+        [(r[0], _iso_to_epoch(r[1]), r[2]) for r in rows]
+    )
+
+    rows = conn.execute("SELECT user_id, end_time, reason FROM mutes").fetchall()
+    conn.execute("DROP TABLE mutes")
+    conn.execute('''CREATE TABLE mutes (
+                      user_id  INTEGER PRIMARY KEY,
+                      end_time INTEGER NOT NULL,
+                      reason   TEXT
+                   )''')
+    conn.executemany(
+        "INSERT OR REPLACE INTO mutes (user_id, end_time, reason) VALUES (?, ?, ?)",
+        [(r[0], _iso_to_epoch(r[1]), r[2]) for r in rows]
+    )
+
+    rows = conn.execute("SELECT guild_id, end_time FROM bomb_cooldowns").fetchall()
+    conn.execute("DROP TABLE bomb_cooldowns")
+    conn.execute('''CREATE TABLE bomb_cooldowns (
+                      guild_id INTEGER PRIMARY KEY,
+                      end_time INTEGER NOT NULL
+                   )''')
+    conn.executemany(
+        "INSERT INTO bomb_cooldowns (guild_id, end_time) VALUES (?, ?)",
+        [(r[0], _iso_to_epoch(r[1])) for r in rows]
+    )
+
+
+def _m003_indexes(conn: sqlite3.Connection):
+    # Покрывающий индекс: get_warnings / get_recent_warnings читают только его.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_warnings_user_ts ON warnings (user_id, timestamp, reason)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mutes_end_time ON mutes (end_time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bomb_cooldowns_end_time ON bomb_cooldowns (end_time)")
+
+
+def _m004_scheduled_jobs(conn: sqlite3.Connection):
+    conn.execute('''CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                      id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                      run_at  INTEGER NOT NULL,
+                      kind    TEXT NOT NULL,
+                      payload TEXT NOT NULL
+                   )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scheduled_jobs_run_at ON scheduled_jobs (run_at)")
+
+
+def _m005_youtube_quota(conn: sqlite3.Connection):
+    conn.execute('''CREATE TABLE IF NOT EXISTS youtube_quota (
+                      key_id    TEXT NOT NULL,
+                      day       TEXT NOT NULL,
+                      used      INTEGER NOT NULL DEFAULT 0,
+                      exhausted INTEGER NOT NULL DEFAULT 0,
+                      PRIMARY KEY (key_id, day)
+                   )''')
+
+
+def _m006_youtube_channels(conn: sqlite3.Connection):
+    # notify_channel_id = NULL — канал уведомлений по умолчанию из конфига.
+    conn.execute('''CREATE TABLE IF NOT EXISTS youtube_channels (
+                      channel_id        TEXT PRIMARY KEY,
+                      notify_channel_id INTEGER,
+                      mention           TEXT NOT NULL DEFAULT '',
+                      message           TEXT NOT NULL DEFAULT '',
+                      added_at          INTEGER NOT NULL
+                   )''')
+    # Каналы, которые раньше были зашиты в код.
+    seed = [
+        (YOUTUBE_CHANNEL_ID_1, "<@&1104385788797534228>", "На канале какая-то движуха. А ну-ка глянем"),
+        (YOUTUBE_CHANNEL_ID_2, "<@&1265571159601319989>", "На втором канале что-то появилось. Давайте-ка заценим"),
+    ]
+    now = int(time.time())
+    conn.executemany(
+        "INSERT OR IGNORE INTO youtube_channels (channel_id, mention, message, added_at) VALUES (?, ?, ?, ?)",
+        [(ch_id, mention, message, now + i) for i, (ch_id, mention, message) in enumerate(seed) if ch_id],
+    )
+
+
+def _m007_meta(conn: sqlite3.Connection):
+    conn.execute('''CREATE TABLE IF NOT EXISTS meta (
+                      key   TEXT PRIMARY KEY,
+                      value TEXT NOT NULL
+                   )''')
+
+
+def _m008_job_attempts(conn: sqlite3.Connection):
+    conn.execute("ALTER TABLE scheduled_jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+
+MIGRATIONS = [
+    _m001_base_tables,
+    _m002_epoch_timestamps,
+    _m003_indexes,
+    _m004_scheduled_jobs,
+    _m005_youtube_quota,
+    _m006_youtube_channels,
+    _m007_meta,
+    _m008_job_attempts,
+]
+
+
+def _migrate() -> int:
+    conn = _connect()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return len(MIGRATIONS)
+
+
+def create_tables() -> int:
+    """Применяет недостающие миграции и возвращает текущую версию схемы."""
+    return _run_sync(_migrate)
+
+
 # ─── Time helpers ─────────────────────────────────────────────────────────
 
 def _utcnow() -> datetime:
@@ -70,87 +399,164 @@ def dt_from_iso(s: str) -> datetime:
     return dt.astimezone(timezone.utc)
 
 
+def dt_to_epoch(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def dt_from_epoch(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
 # ─── Warnings ─────────────────────────────────────────────────────────────
 
+@_db_call
 def get_warnings(user_id: int) -> list:
     with get_db() as conn:
         rows = conn.execute(
             "SELECT timestamp, reason FROM warnings WHERE user_id = ? ORDER BY timestamp",
             (user_id,)
         ).fetchall()
-    return [{'timestamp': r[0], 'reason': r[1]} for r in rows]
+    return [{'timestamp': dt_from_epoch(r[0]), 'reason': r[1]} for r in rows]
 
 
-def add_warning(user_id: int, reason: str):
-    with get_db() as conn:
-        conn.execute(
-            "INSERT INTO warnings (user_id, timestamp, reason) VALUES (?, ?, ?)",
-            (user_id, dt_to_iso(_utcnow()), reason)
-        )
+async def add_warning(user_id: int, reason: str, *, durable: bool = False):
+    await write_queue.write(
+        "INSERT INTO warnings (user_id, timestamp, reason) VALUES (?, ?, ?)",
+        (user_id, dt_to_epoch(_utcnow()), reason),
+        durable=durable,
+    )
 
 
+@_db_call
 def remove_warnings(user_id: int):
     with get_db() as conn:
         conn.execute("DELETE FROM warnings WHERE user_id = ?", (user_id,))
 
 
+@_db_call
 def get_recent_warnings(user_id: int) -> list:
     """Возвращает предупреждения за последние 24 часа."""
-    since = dt_to_iso(_utcnow() - __import__('datetime', fromlist=['timedelta']).timedelta(days=1))
+    since = dt_to_epoch(_utcnow() - timedelta(days=1))
     with get_db() as conn:
         rows = conn.execute(
             "SELECT timestamp, reason FROM warnings WHERE user_id = ? AND timestamp > ?",
             (user_id, since)
         ).fetchall()
-    return [{'timestamp': r[0], 'reason': r[1]} for r in rows]
+    return [{'timestamp': dt_from_epoch(r[0]), 'reason': r[1]} for r in rows]
 
 
 # ─── Mutes ────────────────────────────────────────────────────────────────
 
+@_db_call
 def get_mutes() -> dict:
     with get_db() as conn:
         rows = conn.execute("SELECT user_id, end_time, reason FROM mutes").fetchall()
-    return {r[0]: {'end_time': r[1], 'reason': r[2]} for r in rows}
+    return {r[0]: {'end_time': dt_from_epoch(r[1]), 'reason': r[2]} for r in rows}
 
 
-def add_mute(user_id: int, end_time: datetime, reason: str):
-    with get_db() as conn:
-        conn.execute(
-            "INSERT OR REPLACE INTO mutes (user_id, end_time, reason) VALUES (?, ?, ?)",
-            (user_id, dt_to_iso(end_time), reason)
-        )
+async def add_mute(user_id: int, end_time: datetime, reason: str, *, durable: bool = False):
+    await write_queue.write(
+        "INSERT OR REPLACE INTO mutes (user_id, end_time, reason) VALUES (?, ?, ?)",
+        (user_id, dt_to_epoch(end_time), reason),
+        durable=durable,
+    )
 
 
+@_db_call
 def remove_mute(user_id: int):
     with get_db() as conn:
         conn.execute("DELETE FROM mutes WHERE user_id = ?", (user_id,))
 
 
+@_db_call
+def remove_mutes(user_ids: list[int], expired_by: int):
+    """Удаляет муты, истёкшие не позже expired_by (epoch). Мут, который успели
+    выдать заново, имеет более поздний end_time и остаётся."""
+    with get_db() as conn:
+        conn.executemany(
+            "DELETE FROM mutes WHERE user_id = ? AND end_time <= ?",
+            [(uid, expired_by) for uid in user_ids],
+        )
+
+
 # ─── Bomb cooldowns ──────────────────────────────────────────────────────
 
+@_db_call
 def get_bomb_cooldown(guild_id: int) -> datetime | None:
     with get_db() as conn:
         result = conn.execute(
             "SELECT end_time FROM bomb_cooldowns WHERE guild_id = ?", (guild_id,)
         ).fetchone()
-    return dt_from_iso(result[0]) if result else None
+    return dt_from_epoch(result[0]) if result else None
 
 
+@_db_call
 def set_bomb_cooldown(guild_id: int, end_time: datetime):
     with get_db() as conn:
         conn.execute(
             "INSERT OR REPLACE INTO bomb_cooldowns (guild_id, end_time) VALUES (?, ?)",
-            (guild_id, dt_to_iso(end_time))
+            (guild_id, dt_to_epoch(end_time))
         )
 
 
+@_db_call
 def remove_bomb_cooldown(guild_id: int):
     with get_db() as conn:
         conn.execute("DELETE FROM bomb_cooldowns WHERE guild_id = ?", (guild_id,))
 
 
+# ─── Meta ─────────────────────────────────────────────────────────────────
+
+@_db_call
+def get_meta(key: str) -> str | None:
+    with get_db() as conn:
+        result = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return result[0] if result else None
+
+
+@_db_call
+def set_meta(key: str, value: str):
+    with get_db() as conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
 # ─── YouTube ──────────────────────────────────────────────────────────────
 
+@_db_call
+def get_youtube_channels() -> list[dict]:
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT channel_id, notify_channel_id, mention, message FROM youtube_channels "
+            "ORDER BY added_at, channel_id"
+        ).fetchall()
+    return [
+        {"channel_id": r[0], "notify_channel_id": r[1], "mention": r[2], "message": r[3]}
+        for r in rows
+    ]
+
+
+@_db_call
+def add_youtube_channel(channel_id: str, notify_channel_id: int | None, mention: str, message: str):
+    with get_db() as conn:
+        conn.execute(
+            "INSERT INTO youtube_channels (channel_id, notify_channel_id, mention, message, added_at) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (channel_id) DO UPDATE SET "
+            "notify_channel_id = excluded.notify_channel_id, mention = excluded.mention, "
+            "message = excluded.message",
+            (channel_id, notify_channel_id, mention, message, int(time.time())),
+        )
+
+
+@_db_call
+def remove_youtube_channel(channel_id: str) -> bool:
+    with get_db() as conn:
+        cur = conn.execute("DELETE FROM youtube_channels WHERE channel_id = ?", (channel_id,))
+    return cur.rowcount > 0
+
+
+@_db_call
 def get_last_video_id(channel_id: str) -> str | None:
     with get_db() as conn:
         result = conn.execute(
@@ -159,14 +565,15 @@ def get_last_video_id(channel_id: str) -> str | None:
     return result[0] if result else None
 
 
-def set_last_video_id(channel_id: str, video_id: str):
-    with get_db() as conn:
-        conn.execute(
-            "INSERT OR REPLACE INTO last_video_ids (channel_id, video_id) VALUES (?, ?)",
-            (channel_id, video_id)
-        )
+async def set_last_video_id(channel_id: str, video_id: str, *, durable: bool = False):
+    await write_queue.write(
+        "INSERT OR REPLACE INTO last_video_ids (channel_id, video_id) VALUES (?, ?)",
+        (channel_id, video_id),
+        durable=durable,
+    )
 
 
+@_db_call
 def is_video_known(channel_id: str, video_id: str) -> bool:
     with get_db() as conn:
         result = conn.execute(
@@ -176,24 +583,109 @@ def is_video_known(channel_id: str, video_id: str) -> bool:
     return result is not None
 
 
-def add_video_to_history(channel_id: str, video_id: str):
+async def add_video_to_history(channel_id: str, video_id: str, *, durable: bool = False):
+    await write_queue.write(
+        "INSERT OR IGNORE INTO video_history (channel_id, video_id) VALUES (?, ?)",
+        (channel_id, video_id),
+        durable=durable,
+    )
+
+
+@_db_call
+def add_videos_to_history(channel_id: str, video_ids: list[str]) -> int:
+    """Добавляет пачку видео одной транзакцией; возвращает число новых записей."""
     with get_db() as conn:
-        conn.execute(
+        before = conn.total_changes
+        conn.executemany(
             "INSERT OR IGNORE INTO video_history (channel_id, video_id) VALUES (?, ?)",
-            (channel_id, video_id)
+            [(channel_id, video_id) for video_id in video_ids],
         )
+        return conn.total_changes - before
+
+
+@_db_call
+def get_youtube_quota(day: str) -> dict[str, tuple[int, bool]]:
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT key_id, used, exhausted FROM youtube_quota WHERE day = ?", (day,)
+        ).fetchall()
+    return {r[0]: (r[1], bool(r[2])) for r in rows}
+
+
+async def add_youtube_quota_usage(key_id: str, day: str, cost: int):
+    await write_queue.write(
+        "INSERT INTO youtube_quota (key_id, day, used) VALUES (?, ?, ?) "
+        "ON CONFLICT (key_id, day) DO UPDATE SET used = used + excluded.used",
+        (key_id, day, cost),
+    )
+
+
+async def mark_youtube_key_exhausted(key_id: str, day: str):
+    await write_queue.write(
+        "INSERT INTO youtube_quota (key_id, day, exhausted) VALUES (?, ?, 1) "
+        "ON CONFLICT (key_id, day) DO UPDATE SET exhausted = 1",
+        (key_id, day),
+    )
 
 
 # ─── Role users ───────────────────────────────────────────────────────────
 
-def add_role_user(user_id: int, role_id: int):
+async def add_role_user(user_id: int, role_id: int, *, durable: bool = False):
+    await write_queue.write(
+        "INSERT OR REPLACE INTO role_users (user_id, role_id) VALUES (?, ?)",
+        (user_id, role_id),
+        durable=durable,
+    )
+
+
+@_db_call
+def remove_role_user(user_id: int):
+    with get_db() as conn:
+        conn.execute("DELETE FROM role_users WHERE user_id = ?", (user_id,))
+
+
+# ─── Scheduled jobs ───────────────────────────────────────────────────────
+
+@_db_call
+def add_job(kind: str, run_at: datetime, payload: dict) -> int:
+    with get_db() as conn:
+        cur = conn.execute(
+            "INSERT INTO scheduled_jobs (run_at, kind, payload) VALUES (?, ?, ?)",
+            (dt_to_epoch(run_at), kind, json.dumps(payload))
+        )
+    return cur.lastrowid
+
+
+@_db_call
+def get_next_job_time() -> int | None:
+    with get_db() as conn:
+        result = conn.execute("SELECT MIN(run_at) FROM scheduled_jobs").fetchone()
+    return result[0]
+
+
+@_db_call
+def get_due_jobs(now: int, limit: int = 100) -> list[tuple[int, str, dict, int]]:
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT id, kind, payload, attempts FROM scheduled_jobs WHERE run_at <= ? ORDER BY run_at LIMIT ?",
+            (now, limit)
+        ).fetchall()
+    return [(r[0], r[1], json.loads(r[2]), r[3]) for r in rows]
+
+
+@_db_call
+def retry_job(job_id: int, run_at: int, payload: dict | None = None):
+    """Переносит задание на run_at (epoch) и увеличивает счётчик попыток;
+    payload, если передан, заменяет прежний."""
     with get_db() as conn:
         conn.execute(
-            "INSERT OR REPLACE INTO role_users (user_id, role_id) VALUES (?, ?)",
-            (user_id, role_id)
+            "UPDATE scheduled_jobs SET run_at = ?, attempts = attempts + 1, payload = COALESCE(?, payload) "
+            "WHERE id = ?",
+            (run_at, json.dumps(payload) if payload is not None else None, job_id)
         )
 
 
-def remove_role_user(user_id: int):
+@_db_call
+def remove_jobs(job_ids: list[int]):
     with get_db() as conn:
-        conn.execute("DELETE FROM role_users WHERE user_id = ?", (user_id,))
+        conn.executemany("DELETE FROM scheduled_jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
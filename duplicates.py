@@ -0,0 +1,130 @@
+"""Поиск почти одинаковых сообщений (копипаст-рассылки) по всем пользователям.
+
+Текст нормализуется и режется на символьные шинглы, из которых строится
+MinHash-подпись. Поиск похожих сообщений — через LSH: подпись делится на
+полосы, и кандидатами считаются сообщения, совпавшие хотя бы в одной полосе.
+Индекс хранит только сообщения за последнее окно времени.
+"""
+
+import collections
+import operator
+import re
+
+SHINGLE_SIZE = 5
+NUM_BINS = 32           # длина подписи
+BANDS = 8               # NUM_BINS = BANDS * ROWS
+ROWS = NUM_BINS // BANDS
+MAX_CANDIDATES = 64     # сколько кандидатов проверять на одно сообщение
+
+_MASK = (1 << 64) - 1
+_EMPTY = _MASK + 1
+
+_MENTION_RE = re.compile(r"<(?:@[!&]?|#)\d+>")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    text = _MENTION_RE.sub(" ", text.lower())
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def signature(text: str) -> tuple[int, ...]:
+    """MinHash с одной перестановкой: хэш шингла выбирает корзину, в корзине
+    хранится минимум. Пустые корзины заполняются из ближайшей непустой справа,
+    чтобы короткие тексты сравнивались корректно."""
+    mins = [_EMPTY] * NUM_BINS
+    for i in range(max(1, len(text) - SHINGLE_SIZE + 1)):
+        h = hash(text[i:i + SHINGLE_SIZE]) & _MASK
+        b = h % NUM_BINS
+        if h < mins[b]:
+            mins[b] = h
+    if _EMPTY in mins:
+        filled = [i for i, v in enumerate(mins) if v != _EMPTY]
+        for i in range(NUM_BINS):
+            if mins[i] == _EMPTY:
+                src = min(filled, key=lambda j: (j - i) % NUM_BINS)
+                mins[i] = (mins[src] + (src - i) % NUM_BINS) & _MASK
+    return tuple(mins)
+
+
+def similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Оценка коэффициента Жаккара по двум подписям."""
+    return sum(map(operator.eq, a, b)) / NUM_BINS
+
+
+class _Entry:
+    __slots__ = ("ts", "sig", "user_id", "channel_id", "keys")
+
+    def __init__(self, ts: float, sig: tuple[int, ...], user_id: int, channel_id: int):
+        self.ts = ts
+        self.sig = sig
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.keys = [(band, sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+class DuplicateMatch:
+    __slots__ = ("messages", "channels", "users")
+
+    def __init__(self, messages: int, channels: set[int], users: set[int]):
+        self.messages = messages
+        self.channels = channels
+        self.users = users
+
+
+class DuplicateIndex:
+    def __init__(self, window: float, *, threshold: float = 0.7, min_length: int = 30,
+                 max_entries: int = 50_000):
+        self.window = window
+        self.threshold = threshold
+        self.min_length = min_length
+        self.max_entries = max_entries
+        self._entries: collections.deque[_Entry] = collections.deque()
+        # Ключ полосы -> сообщения в порядке добавления (dict как упорядоченное множество).
+        self._buckets: dict[tuple, dict[_Entry, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop_oldest(self):
+        entry = self._entries.popleft()
+        for key in entry.keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.pop(entry, None)
+                if not bucket:
+                    del self._buckets[key]
+
+    def add(self, ts: float, text: str, user_id: int, channel_id: int) -> DuplicateMatch | None:
+        """Индексирует сообщение и возвращает похожие на него за окно
+        (включая само сообщение) или None, если текст слишком короткий."""
+        while self._entries and (self._entries[0].ts < ts - self.window
+                                 or len(self._entries) >= self.max_entries):
+            self._drop_oldest()
+
+        text = normalize(text)
+        if len(text) < self.min_length:
+            return None
+        entry = _Entry(ts, signature(text), user_id, channel_id)
+
+        channels, users, messages = {channel_id}, {user_id}, 1
+        seen: set[_Entry] = set()
+        for key in entry.keys:
+            bucket = self._buckets.get(key)
+            if not bucket:
+                continue
+            for other in reversed(bucket):
+                if len(seen) >= MAX_CANDIDATES:
+                    break
+                if other in seen:
+                    continue
+                seen.add(other)
+                if similarity(entry.sig, other.sig) >= self.threshold:
+                    messages += 1
+                    channels.add(other.channel_id)
+                    users.add(other.user_id)
+
+        self._entries.append(entry)
+        for key in entry.keys:
+            self._buckets.setdefault(key, {})[entry] = None
+        return DuplicateMatch(messages, channels, users)
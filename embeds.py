@@ -1,9 +1,13 @@
 """Вспомогательные функции для создания embed-ов и константы цветов."""
 
-import discord
+import asyncio
 from datetime import datetime, timezone
+from logging import getLogger
+
+import discord
 
 from config import LOG_CHANNEL_ID
+import metrics
 
 
 def _utcnow() -> datetime:
@@ -75,18 +79,85 @@ def make_action_embed(
 
 # ─── Send log helpers ─────────────────────────────────────────────────────
 
-async def send_log_embed(embed: discord.Embed, bot=None):
-    """Отправляет embed в лог-канал."""
+LOG_FLUSH_INTERVAL = 1.0           # сколько копить embed-ы перед отправкой, сек
+MAX_EMBEDS_PER_MESSAGE = 10        # лимит Discord на одно сообщение
+MAX_EMBED_CHARS_PER_MESSAGE = 6000 # лимит Discord на суммарный текст embed-ов
+
+
+class LogSink:
+    """Буфер лог-канала: копит embed-ы и отправляет до 10 штук одним сообщением.
+
+    Отправка идёт под одним замком в порядке поступления, поэтому срочная
+    запись (immediate=True) уходит сразу, но после уже накопленных. Если
+    Discord отклонил пачку с ошибкой 4xx, embed-ы отправляются по одному.
+    """
+
+    def __init__(self, interval: float = LOG_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending: list[discord.Embed] = []
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.Task | None = None
+
+    async def send(self, embed: discord.Embed, bot, *, immediate: bool = False):
+        self._pending.append(embed)
+        if immediate:
+            await self.flush(bot)
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later(bot))
+
+    async def _flush_later(self, bot):
+        await asyncio.sleep(self.interval)
+        await self.flush(bot)
+
+    def _take_batch(self) -> list[discord.Embed]:
+        batch, size = [], 0
+        while self._pending and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            embed_size = len(self._pending[0])
+            if batch and size + embed_size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(self._pending.pop(0))
+            size += embed_size
+        return batch
+
+    async def flush(self, bot):
+        async with self._lock:
+            while self._pending:
+                channel = bot.get_channel(LOG_CHANNEL_ID)
+                if not channel:
+                    getLogger(__name__).error(f"Log channel {LOG_CHANNEL_ID} not found")
+                    self._pending.clear()
+                    return
+                batch = self._take_batch()
+                try:
+                    await channel.send(embeds=batch)
+                except discord.HTTPException as e:
+                    if len(batch) > 1 and 400 <= e.status < 500 and e.status != 429:
+                        # Скорее всего, Discord отверг один из embed-ов (превышен
+                        # лимит поля и т.п.) — шлём по одному, чтобы потерять только его.
+                        await self._send_each(channel, batch)
+                    else:
+                        getLogger(__name__).error(f"Failed to send {len(batch)} log embeds: {e}")
+
+    @staticmethod
+    async def _send_each(channel, batch: list[discord.Embed]):
+        for embed in batch:
+            try:
+                await channel.send(embed=embed)
+            except discord.HTTPException as e:
+                getLogger(__name__).error(f"Failed to send log embed {embed.title!r}: {e}")
+
+
+log_sink = LogSink()
+
+
+@metrics.timed(metrics.handlers)
+async def send_log_embed(embed: discord.Embed, bot=None, *, immediate: bool = False):
+    """Отправляет embed в лог-канал (через буфер, если не immediate)."""
     if bot is None:
         # Lazy import чтобы избежать циклических зависимостей
         import bot as bot_module
         bot = bot_module.bot
-    channel = bot.get_channel(LOG_CHANNEL_ID)
-    if channel:
-        await channel.send(embed=embed)
-    else:
-        from logging import getLogger
-        getLogger(__name__).error(f"Log channel {LOG_CHANNEL_ID} not found")
+    await log_sink.send(embed, bot, immediate=immediate)
 
 
 async def send_mod_log(
@@ -116,4 +187,4 @@ async def send_mod_log(
         for name, value, inline in extra_fields:
             embed.add_field(name=name, value=value, inline=inline)
     embed.set_footer(text=f"ID: {member.id}")
-    await send_log_embed(embed, bot=bot)
+    await send_log_embed(embed, bot=bot, immediate=True)
@@ -1,27 +1,51 @@
 """Обработчики событий Discord."""
 
+from time import perf_counter
+
 import discord
 
 from embeds import LOG_COLORS, _now_dt, send_log_embed
+import metrics
 from antispam import check_spam, check_new_account
 
 
 def register(bot):
+    on_message_metrics = metrics.handlers.series("on_message")
+    check_spam_metrics = metrics.handlers.series("check_spam")
 
     @bot.event
     async def on_message(message: discord.Message):
-        if message.author == bot.user:
-            return
-        if isinstance(message.channel, discord.DMChannel):
-            await message.author.send(
-                "Данный бот может работать только на сервере «стакан». "
-                "Взаимодействие через личные сообщения не предусмотрено."
-            )
-            return
-        await check_spam(message, bot=bot)
-        await bot.process_commands(message)
+        # Самый частый обработчик замеряется вручную, без metrics.timed:
+        # лишний кадр корутины на каждое сообщение не укладывается в бюджет
+        # накладных расходов (bench_metrics.py). check_spam — отдельная серия.
+        started = perf_counter()
+        try:
+            if message.author == bot.user:
+                return
+            if isinstance(message.channel, discord.DMChannel):
+                await message.author.send(
+                    "Данный бот может работать только на сервере «стакан». "
+                    "Взаимодействие через личные сообщения не предусмотрено."
+                )
+                return
+            # Проверки выше почти бесплатны, поэтому check_spam отсчитывается
+            # от того же started — на каждое сообщение на вызов часов меньше.
+            try:
+                await check_spam(message, bot=bot)
+            except Exception:
+                check_spam_metrics.errors += 1
+                raise
+            finally:
+                check_spam_metrics.observe(perf_counter() - started)
+            await bot.process_commands(message)
+        except Exception:
+            on_message_metrics.errors += 1
+            raise
+        finally:
+            on_message_metrics.observe(perf_counter() - started)
 
     @bot.event
+    @metrics.timed(metrics.handlers)
     async def on_member_update(before: discord.Member, after: discord.Member):
         if before.roles == after.roles:
             return
@@ -45,6 +69,7 @@ def register(bot):
             await send_log_embed(embed, bot=bot)
 
     @bot.event
+    @metrics.timed(metrics.handlers)
     async def on_member_join(member: discord.Member):
         embed = discord.Embed(title="Участник вошёл", color=LOG_COLORS["join"], timestamp=_now_dt())
         embed.set_author(name=str(member), icon_url=member.display_avatar.url)
@@ -56,6 +81,7 @@ def register(bot):
         await check_new_account(member, bot=bot)
 
     @bot.event
+    @metrics.timed(metrics.handlers)
     async def on_member_remove(member: discord.Member):
         embed = discord.Embed(title="Участник вышел", color=LOG_COLORS["leave"], timestamp=_now_dt())
         embed.set_author(name=str(member), icon_url=member.display_avatar.url)
@@ -68,6 +94,7 @@ def register(bot):
         await send_log_embed(embed, bot=bot)
 
     @bot.event
+    @metrics.timed(metrics.handlers)
     async def on_voice_state_update(member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
         if before.channel == after.channel:
             return
@@ -87,6 +114,7 @@ def register(bot):
         await send_log_embed(embed, bot=bot)
 
     @bot.event
+    @metrics.timed(metrics.handlers)
     async def on_message_edit(before: discord.Message, after: discord.Message):
         if before.content == after.content:
             return
@@ -109,6 +137,7 @@ def register(bot):
         await send_log_embed(embed, bot=bot)
 
     @bot.event
+    @metrics.timed(metrics.handlers)
     async def on_message_delete(message: discord.Message):
         if message.author == bot.user or isinstance(message.channel, discord.DMChannel):
             return
@@ -136,6 +165,12 @@ def register(bot):
         from embeds import e_err
         import logging
 
+        # after_invoke не вызывается, если гибридная команда упала при
+        # слэш-вызове, — автоматический defer останавливается здесь, до ответа,
+        # и здесь же записывается ошибка в метрики (если ещё не записана).
+        ctx.stop_auto_defer()
+        ctx.observe_command(failed=True)
+
         if isinstance(error, commands.CheckFailure):
             await ctx.send(embed=e_err("Нет прав", "У вас нет прав для этой команды."))
         elif isinstance(error, commands.MissingRequiredArgument):
@@ -158,3 +193,9 @@ def register(bot):
                 await ctx.send(embed=e_err("Ошибка", "Что-то пошло не так при выполнении команды. Об этом записано в лог."))
             except discord.HTTPException:
                 pass
+
+
+async def setup(bot):
+    # Обработчики ставятся через @bot.event, поэтому перезагрузка модуля
+    # просто заменяет их новыми версиями.
+    register(bot)
@@ -0,0 +1,117 @@
+"""Сторож event loop: замер задержки и стек вызова, который его заблокировал.
+
+Корутина в loop каждые TICK_INTERVAL секунд отмечает «пульс» и пишет
+фактическую задержку в метрики. Отдельный поток следит за пульсом: если он
+не обновлялся дольше порога, поток снимает стек главного потока через
+sys._current_frames() — это и есть блокирующий вызов. Отчёты о зависаниях
+хранятся в кольцевом буфере.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from logging import getLogger
+
+import metrics
+
+logger = getLogger(__name__)
+
+TICK_INTERVAL = 0.1     # как часто loop отмечает пульс, сек
+CHECK_INTERVAL = 0.05   # как часто поток проверяет пульс, сек
+MAX_REPORTS = 20
+STACK_LIMIT = 30        # кадров стека в отчёте
+
+class StallReport:
+    __slots__ = ("started_at", "duration", "stack")
+
+    def __init__(self, started_at: datetime, duration: float, stack: list[str]):
+        self.started_at = started_at
+        self.duration = duration    # растёт, пока зависание продолжается
+        self.stack = stack
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.reports: deque[StallReport] = deque(maxlen=MAX_REPORTS)
+        self._last_tick = time.monotonic()
+        self._current: StallReport | None = None
+        self._lock = threading.Lock()
+        self._loop_thread_id: int | None = None
+        self._ticker: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._ticker is not None and not self._ticker.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._ticker = asyncio.create_task(self._tick_forever())
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._thread.start()
+        logger.info(f"Loop watchdog started, stall threshold {self.threshold * 1000:.0f} ms")
+
+    def stop(self):
+        self._stop.set()
+        if self._ticker:
+            self._ticker.cancel()
+
+    async def _tick_forever(self):
+        histogram = metrics.loop_lag.series("main")
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(TICK_INTERVAL)
+            now = time.monotonic()
+            histogram.observe(max(0.0, now - before - TICK_INTERVAL))
+            with self._lock:
+                self._last_tick = now
+                self._current = None
+
+    def _watch(self):
+        while not self._stop.wait(CHECK_INTERVAL):
+            with self._lock:
+                stalled = time.monotonic() - self._last_tick - TICK_INTERVAL
+                if stalled < self.threshold:
+                    continue
+                if self._current is not None:
+                    self._current.duration = stalled
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = traceback.format_stack(frame, limit=STACK_LIMIT) if frame else []
+                self._current = StallReport(datetime.now(timezone.utc), stalled, stack)
+                self.reports.append(self._current)
+            logger.warning(
+                f"Event loop blocked for {stalled * 1000:.0f} ms, loop thread stack:\n{''.join(stack)}"
+            )
+
+    def recent(self, limit: int = MAX_REPORTS) -> list[StallReport]:
+        with self._lock:
+            return list(self.reports)[-limit:]
+
+
+_watchdog: LoopWatchdog | None = None
+
+
+def start(threshold: float):
+    global _watchdog
+    if threshold <= 0:
+        return
+    if _watchdog is None:
+        _watchdog = LoopWatchdog(threshold)
+    _watchdog.start()
+
+
+def stop():
+    if _watchdog is not None:
+        _watchdog.stop()
+
+
+def recent(limit: int = MAX_REPORTS) -> list[StallReport]:
+    return _watchdog.recent(limit) if _watchdog is not None else []
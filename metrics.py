@@ -0,0 +1,184 @@
+"""Метрики: задержки обработчиков, команд, БД и внешних API в формате Prometheus.
+
+Замер стоит два вызова perf_counter и один bisect по границам корзин;
+серии для декорированных функций создаются заранее, так что на горячем
+пути нет ни поиска по словарю, ни блокировок (все наблюдения делаются из
+event loop). Отдаются по HTTP на METRICS_PORT, если он задан.
+"""
+
+import functools
+import inspect
+from bisect import bisect_left
+from logging import getLogger
+from time import perf_counter
+
+logger = getLogger(__name__)
+
+# Границы корзин гистограмм, сек.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "errors")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Family:
+    """Набор гистограмм одной метрики с одной меткой (handler, command, …)."""
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._series: dict[str, Histogram] = {}
+
+    def series(self, value: str) -> Histogram:
+        histogram = self._series.get(value)
+        if histogram is None:
+            histogram = self._series[value] = Histogram()
+        return histogram
+
+    def observe(self, value: str, seconds: float, error: bool = False):
+        histogram = self.series(value)
+        histogram.observe(seconds)
+        if error:
+            histogram.errors += 1
+
+    def render(self) -> list[str]:
+        name = self.name
+        lines = [f"# HELP {name}_seconds {self.help}", f"# TYPE {name}_seconds histogram"]
+        errors = [f"# HELP {name}_errors_total {self.help}: calls that raised", f"# TYPE {name}_errors_total counter"]
+        for value, histogram in sorted(self._series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += histogram.counts[-1]
+            lines.append(f'{name}_seconds_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f"{name}_seconds_sum{{{label}}} {histogram.sum:.6f}")
+            lines.append(f"{name}_seconds_count{{{label}}} {cumulative}")
+            errors.append(f"{name}_errors_total{{{label}}} {histogram.errors}")
+        return lines + errors
+
+
+handlers = Family("stakan_handler", "Event handler latency", "handler")
+commands = Family("stakan_command", "Command latency", "command")
+db = Family("stakan_db", "Database call latency including executor wait", "function")
+discord_api = Family("stakan_discord_api", "Discord REST request latency", "route")
+youtube_api = Family("stakan_youtube_api", "YouTube Data API request latency", "method")
+loop_lag = Family("stakan_loop_lag", "Event loop scheduling lag", "loop")
+components = Family("stakan_component", "Button callback latency", "component")
+first_response = Family(
+    "stakan_command_first_response", "Time from interaction creation to the first response or defer", "command",
+)
+
+FAMILIES = (handlers, commands, components, db, discord_api, youtube_api, loop_lag, first_response)
+
+
+def timed(family: Family, label: str | None = None):
+    """Декоратор: время выполнения функции (sync или async) в family."""
+    def decorator(func):
+        histogram = family.series(label or func.__name__)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    histogram.errors += 1
+                    raise
+                finally:
+                    histogram.observe(perf_counter() - started)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    histogram.errors += 1
+                    raise
+                finally:
+                    histogram.observe(perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def instrument_discord_http(http):
+    """Оборачивает HTTPClient.request экземпляра: метка — метод и шаблон пути
+    маршрута (/channels/{channel_id}/messages), а не конкретные ID."""
+    request = http.request
+
+    @functools.wraps(request)
+    async def timed_request(route, **kwargs):
+        started = perf_counter()
+        error = False
+        try:
+            return await request(route, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            discord_api.observe(f"{route.method} {route.path}", perf_counter() - started, error)
+
+    http.request = timed_request
+
+
+def render() -> str:
+    lines = []
+    for family in FAMILIES:
+        lines.extend(family.render())
+    return "\n".join(lines) + "\n"
+
+
+# ─── HTTP ───
+
+_runner = None
+
+
+async def start_server(host: str, port: int):
+    global _runner
+    if _runner is not None:
+        return
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(
+            body=render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"Metrics endpoint failed to start on {host}:{port}: {e}")
+        await runner.cleanup()
+        return
+    _runner = runner
+    logger.info(f"Metrics available at http://{host}:{port}/metrics")
+
+
+async def stop_server():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
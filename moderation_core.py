@@ -7,6 +7,7 @@ from config import MUTE_ROLE_ID, MODERATOR_ROLE_ID
 from database import add_mute, add_warning, get_recent_warnings, remove_warnings
 from embeds import e_err, e_warn, make_action_embed, send_mod_log, LOG_COLORS
 from views import UnmuteView
+from tasks import mute_scheduler
 
 
 def _utcnow() -> datetime:
@@ -87,7 +88,8 @@ async def apply_mute(ctx, member: discord.Member, duration_seconds: int, reason:
 
     until = _utcnow() + timedelta(seconds=duration_seconds)
     human = seconds_to_human(duration_seconds)
-    add_mute(member.id, until, reason)
+    await add_mute(member.id, until, reason, durable=True)
+    mute_scheduler.schedule(member.id, until)
 
     embed = make_action_embed(
         action="заглушён", member=member, moderator=ctx.author,
@@ -110,14 +112,14 @@ async def apply_warn(ctx, member: discord.Member, reason: str):
         await ctx.send(embed=e_warn("Уже замьючен", f"{member.mention} уже находится в муте — варн не выдан."))
         return
 
-    add_warning(member.id, reason)
-    recent = get_recent_warnings(member.id)
+    await add_warning(member.id, reason)
+    recent = await get_recent_warnings(member.id)
 
     if len(recent) >= 3:
         muted = await apply_mute(ctx, member, duration_seconds=86400,
                                   reason="3 предупреждения за 24 часа")
         if muted:
-            remove_warnings(member.id)
+            await remove_warnings(member.id)
     else:
         embed = make_action_embed(
             action="предупреждён", member=member, moderator=ctx.author,
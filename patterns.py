@@ -0,0 +1,95 @@
+"""Запрещённый контент: фразы, фишинговые домены и инвайты Discord.
+
+Все шаблоны собираются в одно регулярное выражение в виде префиксного
+дерева, поэтому проверка сообщения — один проход по тексту независимо от
+числа шаблонов. Перезагрузка строит новый матчер и подменяет ссылку целиком.
+
+Формат файла — по шаблону на строку:
+
+    phrase: бесплатный нитро
+    domain: dlscord-gift.com
+    # комментарий
+"""
+
+import re
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+KINDS = ("phrase", "domain")
+
+_INVITE_RE = r"(?:discord(?:app)?\.com/invite|discord\.gg)/[\w-]+"
+
+
+def _trie_regex(words) -> str:
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        ends = "" in node
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if ends else body
+
+    return build(trie)
+
+
+class PatternMatcher:
+    def __init__(self, patterns: dict[str, set[str]], *, invites: bool = True):
+        self.counts = {kind: len(patterns.get(kind, ())) for kind in KINDS}
+        parts = []
+        if patterns.get("phrase"):
+            parts.append(rf"(?P<phrase>(?<!\w){_trie_regex(patterns['phrase'])}(?!\w))")
+        if patterns.get("domain"):
+            parts.append(rf"(?P<domain>(?<![\w-]){_trie_regex(patterns['domain'])}(?![\w-]))")
+        if invites:
+            parts.append(rf"(?P<invite>{_INVITE_RE})")
+        self._regex = re.compile("|".join(parts)) if parts else None
+
+    @classmethod
+    def from_file(cls, path: str, *, invites: bool = True) -> "PatternMatcher":
+        patterns: dict[str, set[str]] = {kind: set() for kind in KINDS}
+        try:
+            with open(path, encoding="utf-8") as f:
+                for lineno, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    kind, sep, value = line.partition(":")
+                    kind, value = kind.strip().lower(), value.strip().lower()
+                    if not sep or kind not in KINDS or not value:
+                        logger.warning(f"{path}:{lineno}: skipped malformed pattern {line!r}")
+                        continue
+                    patterns[kind].add(value)
+        except FileNotFoundError:
+            logger.info(f"Patterns file {path} not found, only invite links are checked")
+        return cls(patterns, invites=invites)
+
+    def match(self, text: str) -> list[tuple[str, str]]:
+        """Возвращает уникальные совпадения (тип, текст) в порядке появления."""
+        if self._regex is None:
+            return []
+        found = {}
+        for m in self._regex.finditer(text.lower()):
+            found.setdefault((m.lastgroup, m.group()), None)
+        return list(found)
+
+
+_matcher = PatternMatcher({})
+
+
+def load_patterns(path: str, *, invites: bool = True) -> dict[str, int]:
+    """Собирает матчер из файла и атомарно подменяет текущий."""
+    global _matcher
+    _matcher = PatternMatcher.from_file(path, invites=invites)
+    return _matcher.counts
+
+
+def match(text: str) -> list[tuple[str, str]]:
+    return _matcher.match(text)
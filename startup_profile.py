@@ -0,0 +1,83 @@
+"""Профиль холодного старта: время импорта модулей и время до on_ready.
+
+Включается переменной STARTUP_PROFILE=1. Модуль импортируется в bot.py
+первым, до discord и модулей бота: он подменяет builtins.__import__ и
+замеряет каждый впервые загружаемый модуль, пока не будет вызван
+report() из on_ready.
+"""
+
+import builtins
+import os
+import sys
+import threading
+import time
+from logging import getLogger
+
+from dotenv import load_dotenv
+
+logger = getLogger(__name__)
+
+# .env читается здесь, потому что config ещё не импортирован.
+load_dotenv()
+ENABLED = os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "0"))    # сек до on_ready; 0 — без проверки
+TOP_MODULES = 15
+
+_started = time.perf_counter()
+_original_import = builtins.__import__
+_inclusive: dict[str, float] = {}
+_self: dict[str, float] = {}
+_imports_total = 0.0
+# Вложенные импорты: [имя, начало, время дочерних импортов].
+_stack: list[list] = []
+_checkpoints: list[tuple[str, float]] = []
+_reported = False
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+    global _imports_total
+    if level or name in sys.modules or threading.current_thread() is not threading.main_thread():
+        return _original_import(name, globals, locals, fromlist, level)
+    frame = [name, time.perf_counter(), 0.0]
+    _stack.append(frame)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _stack.pop()
+        elapsed = time.perf_counter() - frame[1]
+        _inclusive[name] = _inclusive.get(name, 0.0) + elapsed
+        _self[name] = _self.get(name, 0.0) + elapsed - frame[2]
+        if _stack:
+            _stack[-1][2] += elapsed
+        else:
+            _imports_total += elapsed
+
+
+if ENABLED:
+    builtins.__import__ = _profiled_import
+
+
+def checkpoint(name: str):
+    """Отметка этапа старта (время от запуска процесса)."""
+    if ENABLED and not _reported:
+        _checkpoints.append((name, time.perf_counter() - _started))
+
+
+def report():
+    """Вызывается из on_ready: выключает замеры и пишет отчёт в лог."""
+    global _reported
+    if not ENABLED or _reported:
+        return
+    _reported = True
+    builtins.__import__ = _original_import
+    total = time.perf_counter() - _started
+
+    lines = [f"Startup profile: on_ready after {total:.2f}s, imports {_imports_total:.2f}s"]
+    lines += [f"  {name:<28} at {at:6.2f}s" for name, at in _checkpoints]
+    lines.append("  Slowest imports (inclusive / self, ms):")
+    for name, incl in sorted(_inclusive.items(), key=lambda kv: kv[1], reverse=True)[:TOP_MODULES]:
+        lines.append(f"  {name:<40} {incl * 1000:8.1f} {_self[name] * 1000:8.1f}")
+    logger.info("\n".join(lines))
+
+    if STARTUP_BUDGET and total > STARTUP_BUDGET:
+        logger.warning(f"Startup took {total:.2f}s, over the {STARTUP_BUDGET:.2f}s budget")
@@ -0,0 +1,146 @@
+"""Ограниченные по размеру и времени жизни хранилища состояния в памяти."""
+
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+_MISSING = object()
+
+# Все созданные кэши — для фоновой очистки и статистики.
+_registry: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+
+
+class TTLCache:
+    """Словарь с TTL и вытеснением давно не использованных ключей (LRU).
+
+    Запись (`cache[key] = value`) и чтение через `cache[key]` продлевают
+    срок жизни ключа; `get()` и `in` его не трогают. Просроченные ключи
+    удаляются лениво при обращении и периодически — в `sweep()`.
+    С default_factory ведёт себя как defaultdict.
+    """
+
+    def __init__(self, name: str, *, maxsize: int, ttl: float, default_factory=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.default_factory = default_factory
+        # Ключи упорядочены по последнему продлению, а значит и по сроку жизни.
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _registry.add(self)
+
+    def _lookup(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return _MISSING
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return _MISSING
+        return value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            if self.default_factory is None:
+                raise KeyError(key)
+            value = self.default_factory()
+        else:
+            self.hits += 1
+        self[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self.sweep()
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def pop(self, key, default=_MISSING):
+        value = self._lookup(key)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        del self._data[key]
+        return value
+
+    def items(self):
+        now = time.monotonic()
+        return [(k, v) for k, (v, expires_at) in self._data.items() if expires_at > now]
+
+    def sweep(self) -> int:
+        """Удаляет просроченные ключи; просматривает только их."""
+        now = time.monotonic()
+        removed = 0
+        while self._data:
+            key, (_, expires_at) = next(iter(self._data.items()))
+            if expires_at > now:
+                break
+            del self._data[key]
+            removed += 1
+        self.expirations += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def stats() -> dict[str, dict]:
+    return {cache.name: cache.stats() for cache in list(_registry)}
+
+
+SWEEP_INTERVAL = 300
+_sweeper: asyncio.Task | None = None
+
+
+async def _sweep_forever(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        for cache in list(_registry):
+            try:
+                cache.sweep()
+            except Exception as e:
+                logger.error(f"Sweep of {cache.name} failed: {e}")
+
+
+def start_sweeper(interval: float = SWEEP_INTERVAL):
+    global _sweeper
+    if _sweeper is None or _sweeper.done():
+        _sweeper = asyncio.create_task(_sweep_forever(interval))
@@ -1,44 +1,288 @@
-"""Периодические задачи: автоматическое снятие мутов."""
+"""Периодические задачи: автоматическое снятие мутов, отложенные задания."""
 
-from discord.ext import tasks
+import asyncio
+import heapq
+import time
+from datetime import datetime
+from logging import getLogger
+
+import discord
 
 from config import GUILD_ID, MUTE_ROLE_ID
-from database import get_mutes, remove_mute
-from embeds import send_mod_log, LOG_COLORS
-from moderation_core import _utcnow
+from database import (
+    get_mutes,
+    remove_mutes,
+    add_job,
+    get_next_job_time,
+    get_due_jobs,
+    remove_jobs,
+    retry_job,
+    dt_to_epoch,
+)
+from embeds import e_ok, send_mod_log, LOG_COLORS
+from bulk_roles import bulk_update_role
+
+logger = getLogger(__name__)
+
+# Через сколько секунд повторить снятие мута, если оно не удалось.
+MUTE_RETRY_DELAY = 60
+# Потолок экспоненциальной задержки для повторов отложенных заданий, сек.
+JOB_MAX_RETRY_DELAY = 3600
+
+
+class MuteScheduler:
+    """Снимает муты точно в момент истечения.
+
+    Хранит min-кучу (end_time, user_id) в памяти и спит ровно до ближайшего
+    истечения. Таблица mutes остаётся источником истины: при старте куча
+    заполняется из неё, поэтому после перезапуска ничего не теряется.
+    Отменённые и продлённые муты удаляются из кучи лениво.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[int, int]] = []
+        self._deadlines: dict[int, int] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.bot = None
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, bot):
+        if self.is_running():
+            return
+        self.bot = bot
+        self._wakeup = asyncio.Event()
+        for user_id, mute_info in (await get_mutes()).items():
+            self._push(user_id, dt_to_epoch(mute_info['end_time']))
+        self._task = asyncio.create_task(self._run())
+
+    def schedule(self, user_id: int, end_time: datetime):
+        self._push(user_id, dt_to_epoch(end_time))
+
+    def cancel(self, user_id: int):
+        self._deadlines.pop(user_id, None)
+
+    def _push(self, user_id: int, deadline: int):
+        self._deadlines[user_id] = deadline
+        heapq.heappush(self._heap, (deadline, user_id))
+        if self._wakeup is not None:
+            self._wakeup.set()
 
+    def _next_deadline(self) -> int | None:
+        while self._heap:
+            deadline, user_id = self._heap[0]
+            if self._deadlines.get(user_id) == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
 
-@tasks.loop(minutes=1)
-async def check_mutes(bot):
-    try:
-        now = _utcnow()
-        for user_id, mute_info in list(get_mutes().items()):
+    def _pop_due(self) -> list[int]:
+        now = int(time.time())
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, user_id = heapq.heappop(self._heap)
+            if self._deadlines.get(user_id) == deadline:
+                del self._deadlines[user_id]
+                due.append(user_id)
+        return due
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            self._wakeup.clear()
+            deadline = self._next_deadline()
+            try:
+                if deadline is None:
+                    await self._wakeup.wait()
+                else:
+                    delay = deadline - time.time()
+                    if delay > 0:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+            due = self._pop_due()
+            if due:
+                try:
+                    await self._expire(due)
+                except Exception as e:
+                    logger.error(f"Mute scheduler fatal error: {e}")
+                    for user_id in due:
+                        self._push(user_id, int(time.time()) + MUTE_RETRY_DELAY)
+
+    async def _expire(self, user_ids: list[int]):
+        guild = self.bot.get_guild(GUILD_ID)
+        if not guild:
+            for user_id in user_ids:
+                self._push(user_id, int(time.time()) + MUTE_RETRY_DELAY)
+            return
+
+        expired_by = int(time.time())
+        role = discord.utils.get(guild.roles, id=MUTE_ROLE_ID)
+        done, unmuted = [], []
+        for user_id in user_ids:
+            if user_id in self._deadlines:
+                # Пока снимались предыдущие, участника замьютили заново.
+                continue
+            member = guild.get_member(user_id)
+            if not member:
+                done.append(user_id)
+                continue
             try:
-                from database import dt_from_iso
-                end_time = dt_from_iso(mute_info['end_time'])
-                if now < end_time:
-                    continue
-                guild = bot.get_guild(GUILD_ID)
-                if not guild:
-                    continue
-                member = guild.get_member(user_id)
-                if not member:
-                    remove_mute(user_id)
-                    continue
-                import discord
-                role = discord.utils.get(guild.roles, id=MUTE_ROLE_ID)
                 if role and role in member.roles:
                     await member.remove_roles(role, reason="Время мьюта истекло")
-                remove_mute(user_id)
-                await send_mod_log("Мут истёк", LOG_COLORS["join"], member, bot=bot)
+                done.append(user_id)
+                unmuted.append(member)
+            except Exception as e:
+                logger.error(f"Auto-unmute error for user {user_id}: {e}")
+                self._push(user_id, int(time.time()) + MUTE_RETRY_DELAY)
+
+        # Мут, выданный заново во время await выше, имеет end_time позже
+        # expired_by и не удаляется.
+        await remove_mutes(done, expired_by)
+        for member in unmuted:
+            await send_mod_log("Мут истёк", LOG_COLORS["join"], member, bot=self.bot)
+
+
+mute_scheduler = MuteScheduler()
+
+
+class RetryJob(Exception):
+    """Обработчик задания просит повторить его позже.
+
+    Именованные аргументы заменяют соответствующие поля payload в повторе
+    (например, оставляют только тех участников, с кем не получилось).
+    """
+
+    def __init__(self, message: str, **payload):
+        super().__init__(message)
+        self.payload = payload
+
+
+class JobScheduler:
+    """Отложенные задания, переживающие перезапуск бота.
+
+    Задания хранятся в таблице scheduled_jobs; в памяти держится только
+    время ближайшего из них. Когда срок подходит, все созревшие задания
+    читаются из БД и выполняются одной пачкой. Обработчики регистрируются
+    по типу задания через `@job_scheduler.handler("kind")` и получают
+    бота и поля payload как именованные аргументы.
+
+    Если обработчик упал или бросил RetryJob, задание остаётся в таблице и
+    переносится с экспоненциальной задержкой (до JOB_MAX_RETRY_DELAY).
+    """
+
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = batch_size
+        self._handlers: dict[str, callable] = {}
+        self._next_run: int | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.bot = None
+
+    def handler(self, kind: str):
+        def decorator(func):
+            self._handlers[kind] = func
+            return func
+        return decorator
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, bot):
+        if self.is_running():
+            return
+        self.bot = bot
+        self._wakeup = asyncio.Event()
+        self._next_run = await get_next_job_time()
+        self._task = asyncio.create_task(self._run())
+
+    async def schedule(self, kind: str, run_at: datetime, **payload) -> int:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = await add_job(kind, run_at, payload)
+        run_at_ts = dt_to_epoch(run_at)
+        if self._next_run is None or run_at_ts < self._next_run:
+            self._next_run = run_at_ts
+            if self._wakeup is not None:
+                self._wakeup.set()
+        return job_id
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            self._wakeup.clear()
+            try:
+                if self._next_run is None:
+                    await self._wakeup.wait()
+                else:
+                    delay = self._next_run - time.time()
+                    if delay > 0:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self._run_due()
+                self._next_run = await get_next_job_time()
             except Exception as e:
-                from logging import getLogger
-                getLogger(__name__).error(f"Auto-unmute error for user {user_id}: {e}")
-    except Exception as e:
-        from logging import getLogger
-        getLogger(__name__).error(f"check_mutes task fatal error: {e}")
+                logger.error(f"Job scheduler fatal error: {e}")
+                self._next_run = int(time.time()) + MUTE_RETRY_DELAY
+
+    async def _run_due(self):
+        while True:
+            jobs = await get_due_jobs(int(time.time()), self.batch_size)
+            if not jobs:
+                return
+            finished = []
+            for job_id, kind, payload, attempts in jobs:
+                handler = self._handlers.get(kind)
+                if handler is None:
+                    logger.error(f"Job {job_id}: no handler for kind {kind!r}")
+                    finished.append(job_id)
+                    continue
+                try:
+                    await handler(self.bot, **payload)
+                except Exception as e:
+                    delay = min(MUTE_RETRY_DELAY * 2 ** attempts, JOB_MAX_RETRY_DELAY)
+                    logger.error(f"Job {job_id} ({kind}) failed, retry #{attempts + 1} in {delay}s: {e}")
+                    retry_payload = {**payload, **e.payload} if isinstance(e, RetryJob) else None
+                    await retry_job(job_id, int(time.time()) + delay, retry_payload)
+                else:
+                    finished.append(job_id)
+            await remove_jobs(finished)
+
+
+job_scheduler = JobScheduler()
+
 
+@job_scheduler.handler("remove_role")
+async def _remove_role_job(bot, guild_id: int, role_id: int, user_ids: list[int], reason: str,
+                           channel_id: int | None = None, notice: list[str] | None = None):
+    """Снимает роль с участников; опционально пишет об этом в канал.
 
-@check_mutes.before_loop
-async def before_tasks(bot):
-    await bot.wait_until_ready()
+    Если гильдия недоступна, задание повторяется целиком; если не удалось
+    снять роль с части участников — повторяется только для них (без
+    повторного уведомления).
+    """
+    guild = bot.get_guild(guild_id)
+    if guild is None:
+        raise RetryJob(f"guild {guild_id} is not available")
+    role = guild.get_role(role_id)
+    if role is None:
+        logger.warning(f"remove_role job: role {role_id} no longer exists, nothing to remove")
+        return
+    members = [m for m in (guild.get_member(uid) for uid in user_ids) if m and role in m.roles]
+    result = await bulk_update_role(members, role, add=False, reason=reason)
+    if channel_id and notice:
+        channel = bot.get_channel(channel_id)
+        if channel:
+            await channel.send(embed=e_ok(*notice))
+    if result.failed:
+        raise RetryJob(
+            f"{len(result.failed)} of {result.total} members still have the role",
+            user_ids=[member.id for member, _ in result.failed],
+            notice=None,
+        )
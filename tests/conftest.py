@@ -0,0 +1,18 @@
+"""Общая настройка тестов: корень проекта в sys.path и заглушки обязательных
+переменных окружения, чтобы config импортировался без .env."""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+for name in (
+    "MUTE_ROLE_ID", "YOUR_ADMIN_ROLE_ID", "NOTIFICATION_CHANNEL_ID", "LOG_CHANNEL_ID",
+    "YT_SUBSCRIBER_ROLE_ID", "SEC_YT_SUBSCRIBER_ROLE_ID", "USER_ID", "MODERATOR_ROLE_ID",
+    "ANTISPAM_CHANNEL_ID", "GUILD_ID",
+):
+    os.environ.setdefault(name, "1")
+os.environ.setdefault("YOUTUBE_API_KEYS", "test-key")
+os.environ.setdefault("DB_FILE", os.path.join(tempfile.mkdtemp(prefix="stakan-tests-"), "bot.db"))
@@ -0,0 +1,141 @@
+"""Гибридная команда, упавшая при слэш-вызове: discord.py не вызывает
+after_invoke, поэтому завершение ложится на on_command_error."""
+
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from discord.ext import commands
+
+
+class FakeResponse:
+    def __init__(self, calls: list):
+        self.calls = calls
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, *, ephemeral: bool = False, **kwargs):
+        self._done = True
+        self.calls.append("defer")
+
+    async def send_message(self, **kwargs):
+        self._done = True
+        self.calls.append("send_message")
+        return SimpleNamespace(resource=None)
+
+
+class FakeFollowup:
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    async def send(self, **kwargs):
+        self.calls.append("followup")
+
+
+class FakeInteraction:
+    def __init__(self, client):
+        self.client = client
+        self.calls: list[str] = []
+        self.created_at = datetime.now(timezone.utc)
+        self.extras: dict = {}
+        self.response = FakeResponse(self.calls)
+        self.followup = FakeFollowup(self.calls)
+        self.command = None
+        self.namespace = SimpleNamespace()
+
+    def is_expired(self) -> bool:
+        return False
+
+    async def original_response(self):
+        return None
+
+
+@pytest.fixture
+def stakan(tmp_path, monkeypatch):
+    # bot.py при импорте создаёт лог-файл в текущем каталоге.
+    monkeypatch.chdir(tmp_path)
+    import bot as bot_module
+    import events
+
+    events.register(bot_module.bot)
+    return bot_module
+
+
+async def _invoke_failing(stakan, delay: float) -> tuple[FakeInteraction, commands.Context]:
+    bot = stakan.bot
+    # bot.dispatch планирует обработчики в loop клиента.
+    await bot._async_setup_hook()
+
+    @commands.hybrid_command(name="test_explode")
+    async def explode(ctx):
+        await asyncio.sleep(delay)
+        raise RuntimeError("boom")
+
+    interaction = FakeInteraction(bot)
+    interaction.command = explode.app_command
+    ctx = stakan.StakanContext(message=SimpleNamespace(_state=bot._connection), bot=bot, view=None, interaction=interaction)
+
+    async def get_context(origin, *, cls=None):
+        return ctx
+
+    bot.add_command(explode)
+    bot.get_context = get_context
+    try:
+        # Аргументы берутся из ctx, пространство имён не используется.
+        await explode.app_command._invoke_with_namespace(interaction, None)
+        # on_command_error запускается отдельной задачей через bot.dispatch.
+        for _ in range(50):
+            if "send_message" in interaction.calls or "followup" in interaction.calls:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        bot.remove_command("test_explode")
+        del bot.get_context
+    return interaction, ctx
+
+
+def test_error_reply_stops_auto_defer(stakan, monkeypatch):
+    monkeypatch.setattr(stakan, "AUTO_DEFER_AFTER", 0.1)
+
+    async def scenario():
+        interaction, ctx = await _invoke_failing(stakan, delay=0)
+        # Ответ об ошибке — первый ответ, а отложенный defer отменён и не
+        # сработает после него.
+        assert interaction.calls == ["send_message"]
+        await asyncio.sleep(0.2)
+        assert ctx._auto_defer_task.cancelled()
+        assert interaction.calls == ["send_message"]
+
+    asyncio.run(scenario())
+
+
+def test_error_after_auto_defer_goes_to_followup(stakan, monkeypatch):
+    monkeypatch.setattr(stakan, "AUTO_DEFER_AFTER", 0.05)
+
+    async def scenario():
+        interaction, ctx = await _invoke_failing(stakan, delay=0.15)
+        assert interaction.calls == ["defer", "followup"]
+        assert ctx.auto_deferred
+
+    asyncio.run(scenario())
+
+
+def test_failure_is_recorded_once(stakan, monkeypatch):
+    import metrics
+
+    monkeypatch.setattr(stakan, "AUTO_DEFER_AFTER", 0)
+    monkeypatch.setattr(metrics.commands, "_series", {})
+    histogram = metrics.commands.series("test_explode")
+
+    async def scenario():
+        _, ctx = await _invoke_failing(stakan, delay=0)
+        assert (sum(histogram.counts), histogram.errors) == (1, 1)
+        # Префиксная команда при ошибке проходит и через after_invoke —
+        # повторной записи нет.
+        await stakan._stop_command_timer(ctx)
+        assert (sum(histogram.counts), histogram.errors) == (1, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,169 @@
+"""WebSub: подписка, подтверждение и уведомление через подставной хаб."""
+
+import asyncio
+import hashlib
+import hmac
+from urllib.parse import urlencode
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer, unused_port
+
+import websub
+import youtube
+
+CHANNEL_ID = "UCtestchannel"
+SECRET = "s3cret"
+
+FEED = f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <id>yt:video:vid123</id>
+    <yt:videoId>vid123</yt:videoId>
+    <yt:channelId>{CHANNEL_ID}</yt:channelId>
+    <title>New video</title>
+  </entry>
+</feed>
+""".encode()
+
+
+def _sign(body: bytes, secret: str = SECRET) -> str:
+    return "sha1=" + hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+
+
+class FakeHub:
+    """Хаб, который, как настоящий, подтверждает подписку GET-запросом
+    к callback и запоминает выданный секрет."""
+
+    def __init__(self):
+        self.subscriptions: dict[str, dict] = {}
+        self.verified: list[str] = []
+
+    async def handle_subscribe(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        self.subscriptions[form["hub.topic"]] = dict(form)
+        asyncio.get_running_loop().create_task(self._verify(dict(form)))
+        return web.Response(status=202)
+
+    async def _verify(self, form: dict):
+        query = {
+            "hub.mode": form["hub.mode"],
+            "hub.topic": form["hub.topic"],
+            "hub.challenge": "challenge-42",
+            "hub.lease_seconds": form["hub.lease_seconds"],
+        }
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{form['hub.callback']}?{urlencode(query)}") as resp:
+                if resp.status == 200 and await resp.text() == "challenge-42":
+                    self.verified.append(form["hub.topic"])
+
+    async def publish(self, topic: str, body: bytes, signature: str | None = None) -> int:
+        sub = self.subscriptions[topic]
+        headers = {"Content-Type": "application/atom+xml"}
+        headers["X-Hub-Signature"] = signature if signature is not None else _sign(body, sub["hub.secret"])
+        async with aiohttp.ClientSession() as session:
+            async with session.post(sub["hub.callback"], data=body, headers=headers) as resp:
+                return resp.status
+
+
+async def _with_receiver(scenario):
+    hub = FakeHub()
+    app = web.Application()
+    app.router.add_post("/subscribe", hub.handle_subscribe)
+    async with TestServer(app) as hub_server:
+        port = unused_port()
+        receiver = websub.WebSubReceiver(
+            f"http://127.0.0.1:{port}/websub",
+            SECRET,
+            hub_url=str(hub_server.make_url("/subscribe")),
+            lease_seconds=3600,
+        )
+        await receiver.start(None, "127.0.0.1", port)
+        try:
+            # Продление запускается при старте приёмника; ждём подтверждения.
+            await _wait_for(lambda: len(hub.verified) == len(receiver.topics()))
+            await scenario(hub, receiver)
+        finally:
+            await receiver.stop()
+
+
+def _run(scenario, monkeypatch):
+    notified = []
+
+    async def fake_notify(bot, entries):
+        notified.extend(entries)
+        return len(entries)
+
+    monkeypatch.setattr(youtube, "YT_CHANNELS", {CHANNEL_ID: {"channel_id": CHANNEL_ID}})
+    monkeypatch.setattr(youtube, "notify_new_videos", fake_notify)
+    asyncio.run(_with_receiver(scenario))
+    return notified
+
+
+async def _wait_for(condition, timeout: float = 5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_subscribe_verify_notify(monkeypatch):
+    topic = websub.TOPIC_URL.format(CHANNEL_ID)
+
+    async def scenario(hub, receiver):
+        assert topic in hub.verified
+        assert hub.subscriptions[topic]["hub.secret"] == SECRET
+        assert receiver.healthy()
+
+        assert await hub.publish(topic, FEED) == 204
+        await _wait_for(lambda: not receiver._pending and receiver.received)
+        assert receiver.rejected == 0
+
+    assert _run(scenario, monkeypatch) == [(CHANNEL_ID, "vid123")]
+
+
+def test_bad_signature_is_rejected_before_parsing(monkeypatch):
+    topic = websub.TOPIC_URL.format(CHANNEL_ID)
+    parsed = []
+
+    async def scenario(hub, receiver):
+        original = websub.ET.XMLPullParser
+
+        def spy(*args, **kwargs):
+            parsed.append(True)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(websub.ET, "XMLPullParser", spy)
+
+        # Неверная подпись над невалидным XML: 2xx по спецификации, без разбора.
+        assert await hub.publish(topic, b"<feed><entry>", signature=_sign(b"other")) == 202
+        # Подпись чужим секретом над валидной лентой.
+        assert await hub.publish(topic, FEED, signature=_sign(FEED, "wrong")) == 202
+        # Без заголовка подписи.
+        assert await hub.publish(topic, FEED, signature="") == 202
+        assert receiver.rejected == 3
+        assert receiver.received == 0
+
+    assert _run(scenario, monkeypatch) == []
+    assert parsed == []
+
+
+def test_signed_invalid_xml_is_bad_request(monkeypatch):
+    topic = websub.TOPIC_URL.format(CHANNEL_ID)
+
+    async def scenario(hub, receiver):
+        assert await hub.publish(topic, b"<feed><entry>") == 400
+        assert receiver.received == 0
+
+    assert _run(scenario, monkeypatch) == []
+
+
+def test_verify_unknown_topic_is_not_found(monkeypatch):
+    async def scenario(hub, receiver):
+        query = urlencode({"hub.mode": "subscribe", "hub.topic": "https://example.com/other", "hub.challenge": "x"})
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{receiver.callback_url}?{query}") as resp:
+                assert resp.status == 404
+
+    _run(scenario, monkeypatch)
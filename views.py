@@ -6,7 +6,9 @@ from discord.ui import Button, View
 from database import remove_mute, add_role_user, remove_role_user
 from embeds import e_ok, e_err, e_warn, e_info, send_mod_log, LOG_COLORS
 from config import MUTE_ROLE_ID
+from tasks import mute_scheduler
 from logging import getLogger
+import metrics
 
 logger = getLogger(__name__)
 
@@ -22,6 +24,7 @@ class UnmuteView(discord.ui.View):
         btn.callback = self._callback
         self.add_item(btn)
 
+    @metrics.timed(metrics.components, "unmute")
     async def _callback(self, interaction: discord.Interaction):
         if not interaction.user.guild_permissions.manage_messages:
             await interaction.response.send_message(
@@ -40,7 +43,8 @@ class UnmuteView(discord.ui.View):
         role = discord.utils.get(interaction.guild.roles, id=MUTE_ROLE_ID)
         if role and role in member.roles:
             await member.remove_roles(role, reason=f"Анмьют через кнопку ({interaction.user})")
-            remove_mute(user_id)
+            await remove_mute(user_id)
+            mute_scheduler.cancel(user_id)
             for item in self.children:
                 item.disabled = True
                 item.label = "Мут снят"
@@ -77,9 +81,11 @@ class SubscribeView(discord.ui.View):
         remove_btn.callback = self._remove_callback
         self.add_item(remove_btn)
 
+    @metrics.timed(metrics.components, "subscribe_add")
     async def _add_callback(self, interaction: discord.Interaction):
         await self._update_role(interaction, add=True)
 
+    @metrics.timed(metrics.components, "subscribe_remove")
     async def _remove_callback(self, interaction: discord.Interaction):
         await self._update_role(interaction, add=False)
 
@@ -91,7 +97,7 @@ class SubscribeView(discord.ui.View):
         if add:
             if role not in interaction.user.roles:
                 await interaction.user.add_roles(role)
-                add_role_user(interaction.user.id, self.role_id)
+                await add_role_user(interaction.user.id, self.role_id)
                 await interaction.response.send_message(
                     embed=e_ok("Роль выдана", f"Вам выдана роль {role.mention}!"), ephemeral=True
                 )
@@ -102,7 +108,7 @@ class SubscribeView(discord.ui.View):
         else:
             if role in interaction.user.roles:
                 await interaction.user.remove_roles(role)
-                remove_role_user(interaction.user.id)
+                await remove_role_user(interaction.user.id)
                 await interaction.response.send_message(
                     embed=e_ok("Роль снята", f"Роль {role.mention} удалена."), ephemeral=True
                 )
@@ -120,6 +126,7 @@ class ConfirmView(discord.ui.View):
         self.message: discord.Message | None = None
 
     @discord.ui.button(label="Подтвердить", style=discord.ButtonStyle.green)
+    @metrics.timed(metrics.components, "confirm")
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.author:
             await interaction.response.send_message("Это не ваша кнопка.", ephemeral=True)
@@ -131,6 +138,7 @@ class ConfirmView(discord.ui.View):
             await self.message.delete()
 
     @discord.ui.button(label="Отмена", style=discord.ButtonStyle.red)
+    @metrics.timed(metrics.components, "cancel")
     async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.author:
             await interaction.response.send_message("Это не ваша кнопка.", ephemeral=True)
@@ -147,6 +155,7 @@ class AdminMenuView(discord.ui.View):
         super().__init__(timeout=None)
 
     @discord.ui.button(label="Проверить YouTube каналы", style=discord.ButtonStyle.blurple, custom_id="admin_check_yt")
+    @metrics.timed(metrics.components, "admin_check_yt")
     async def check_yt_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not interaction.user.guild_permissions.manage_messages:
             await interaction.response.send_message(embed=e_err("Нет прав"), ephemeral=True)
@@ -156,37 +165,67 @@ class AdminMenuView(discord.ui.View):
         await check_youtube_channels(reply_channel=interaction.channel, bot=interaction.client)
 
     @discord.ui.button(label="Обновить ID последних видео", style=discord.ButtonStyle.green, custom_id="admin_update_ids")
+    @metrics.timed(metrics.components, "admin_update_ids")
     async def update_ids_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not interaction.user.guild_permissions.manage_messages:
             await interaction.response.send_message(embed=e_err("Нет прав"), ephemeral=True)
             return
         await interaction.response.send_message("Обновляю ID последних видео...", ephemeral=True)
-        from youtube import fetch_and_save_latest_video_ids
-        await fetch_and_save_latest_video_ids()
+        from youtube import fetch_and_save_latest_video_ids, YouTubeQuotaExhausted
+        try:
+            await fetch_and_save_latest_video_ids()
+        except YouTubeQuotaExhausted as e:
+            await interaction.followup.send(
+                embed=e_err("Квота YouTube исчерпана", f"{e}\nПовторите после сброса квоты."), ephemeral=True
+            )
+            return
+        except Exception as e:
+            logger.error(f"Updating latest video IDs failed: {e!r}")
+            await interaction.followup.send(embed=e_err("Ошибка YouTube API", str(e)[:200]), ephemeral=True)
+            return
         await interaction.followup.send(embed=e_ok("Готово", "ID последних видео обновлены."), ephemeral=True)
 
-    @discord.ui.button(label="Перезагрузить бота", style=discord.ButtonStyle.red, custom_id="admin_restart")
+    @discord.ui.button(label="Перезагрузить модули", style=discord.ButtonStyle.red, custom_id="admin_restart")
+    @metrics.timed(metrics.components, "admin_restart")
     async def restart_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not interaction.user.guild_permissions.manage_messages:
             await interaction.response.send_message(embed=e_err("Нет прав"), ephemeral=True)
             return
-        await interaction.response.send_message(embed=e_warn("Перезагрузка", "Бот перезапускается..."), ephemeral=True)
-        import asyncio
-        import sys
-        import os
-        logger.info(f"Bot restarting by {interaction.user}")
-        await asyncio.sleep(2)
-        os.execv(sys.executable, ['python'] + sys.argv)
+        # Горячая перезагрузка расширений вместо перезапуска процесса:
+        # сессия gateway, кэш участников и состояние в памяти сохраняются.
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        logger.info(f"Extensions reload by {interaction.user}")
+        from commands.admin import _reload_report
+        results = await interaction.client.reload_modules()
+        await interaction.followup.send(embed=_reload_report(results), ephemeral=True)
 
     @discord.ui.button(label="Спарсить все видео YouTube", style=discord.ButtonStyle.primary, custom_id="admin_fetch_all_videos")
+    @metrics.timed(metrics.components, "admin_fetch_all_videos")
     async def fetch_all_videos_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not interaction.user.guild_permissions.manage_messages:
             await interaction.response.send_message(embed=e_err("Нет прав"), ephemeral=True)
             return
         await interaction.response.send_message("Парсю все публичные видео с YouTube каналов...", ephemeral=True)
-        from youtube import fetch_all_videos_to_history
-        total = await fetch_all_videos_to_history()
+        from youtube import fetch_all_videos_to_history, YouTubeQuotaExhausted
+        try:
+            stats = await fetch_all_videos_to_history()
+        except YouTubeQuotaExhausted as e:
+            # Уже сохранённые страницы остаются в истории; повтор их пропустит.
+            await interaction.followup.send(
+                embed=e_err("Квота YouTube исчерпана", f"{e}\nПовторите после сброса квоты."), ephemeral=True
+            )
+            return
+        except Exception as e:
+            logger.error(f"YouTube backfill failed: {e!r}")
+            await interaction.followup.send(embed=e_err("Ошибка YouTube API", str(e)[:200]), ephemeral=True)
+            return
+        elapsed = max(stats['elapsed'], 1e-9)
         await interaction.followup.send(
-            embed=e_ok("Готово", f"Сохранено {total} уникальных видео в историю."),
+            embed=e_ok(
+                "Готово",
+                f"Сохранено {stats['saved']} уникальных видео в историю.\n"
+                f"Страниц: {stats['pages']} ({stats['pages'] / elapsed:.1f}/с) · "
+                f"видео: {stats['rows']} ({stats['rows'] / elapsed:.0f}/с)",
+            ),
             ephemeral=True
         )
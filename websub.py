@@ -0,0 +1,257 @@
+"""WebSub (PubSubHubbub): push-уведомления YouTube о новых видео.
+
+Необязательный встроенный HTTP-сервер принимает Atom-уведомления хаба,
+проверяет HMAC-подпись и передаёт видео в общий путь дедупликации и
+уведомлений (youtube.notify_new_videos). Тело читается с ограничением
+размера, а XML разбирается только после проверки подписи. Подписки
+продлеваются до истечения аренды; пока подписка на какой-либо канал не
+подтверждена или просрочена, каналы опрашиваются по таймеру.
+"""
+
+import asyncio
+import hmac
+import secrets
+import time
+import xml.etree.ElementTree as ET
+from logging import getLogger
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+from config import (
+    WEBSUB_CALLBACK_URL,
+    WEBSUB_HOST,
+    WEBSUB_PORT,
+    WEBSUB_SECRET,
+    WEBSUB_HUB_URL,
+    WEBSUB_LEASE_SECONDS,
+    YOUTUBE_POLL_INTERVAL,
+)
+import youtube
+
+logger = getLogger(__name__)
+
+TOPIC_URL = "https://www.youtube.com/xml/feeds/videos.xml?channel_id={}"
+RENEW_CHECK_INTERVAL = 600      # как часто проверять аренды, сек
+RENEW_MARGIN = 0.2              # продлевать, когда осталось 20% аренды
+RESUBSCRIBE_BACKOFF = 900       # не чаще, пока хаб не подтвердил подписку
+MAX_BODY = 1 << 20
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+_YT = "{http://www.youtube.com/xml/schemas/2015}"
+_SIGNATURE_ALGOS = {"sha1", "sha256", "sha384", "sha512"}
+
+
+class WebSubReceiver:
+    def __init__(self, callback_url: str, secret: str, *, hub_url: str, lease_seconds: int):
+        self.callback_url = callback_url
+        self.path = urlsplit(callback_url).path or "/"
+        self.secret = secret
+        self.hub_url = hub_url
+        self.lease_seconds = lease_seconds
+        self.bot = None
+        # topic -> момент истечения подтверждённой аренды (monotonic)
+        self._leases: dict[str, float] = {}
+        # topic -> момент последнего запроса подписки (monotonic)
+        self._requested: dict[str, float] = {}
+        self._runner: web.AppRunner | None = None
+        self._renewer: asyncio.Task | None = None
+        self._pending: set[asyncio.Task] = set()
+        self.received = 0
+        self.rejected = 0
+
+    def topics(self) -> dict[str, str]:
+        """topic URL -> channel_id для всех отслеживаемых каналов."""
+        return {TOPIC_URL.format(ch_id): ch_id for ch_id in youtube.YT_CHANNELS}
+
+    def healthy(self) -> bool:
+        """Все каналы покрыты действующими подписками."""
+        now = time.monotonic()
+        return all(self._leases.get(topic, 0) > now for topic in self.topics())
+
+    async def start(self, bot, host: str, port: int):
+        self.bot = bot
+        app = web.Application(client_max_size=MAX_BODY)
+        app.router.add_get(self.path, self._handle_verify)
+        app.router.add_post(self.path, self._handle_notify)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._renewer = asyncio.create_task(self._renew_forever())
+        logger.info(f"WebSub receiver listening on {host}:{port}{self.path}")
+
+    async def stop(self):
+        if self._renewer:
+            self._renewer.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # ─── Hub → нас ───
+
+    async def _handle_verify(self, request: web.Request) -> web.Response:
+        """Подтверждение (или отказ) подписки от хаба."""
+        mode = request.query.get("hub.mode")
+        topic = request.query.get("hub.topic", "")
+        if mode == "denied":
+            logger.warning(f"WebSub subscription denied for {topic}: {request.query.get('hub.reason')}")
+            self._leases.pop(topic, None)
+            return web.Response()
+        if mode not in ("subscribe", "unsubscribe") or topic not in self.topics():
+            return web.Response(status=404)
+        if mode == "subscribe":
+            try:
+                lease = int(request.query.get("hub.lease_seconds", self.lease_seconds))
+            except ValueError:
+                lease = self.lease_seconds
+            self._leases[topic] = time.monotonic() + lease
+            logger.info(f"WebSub subscription to {topic} verified for {lease}s")
+        else:
+            self._leases.pop(topic, None)
+        return web.Response(text=request.query.get("hub.challenge", ""))
+
+    async def _handle_notify(self, request: web.Request) -> web.Response:
+        algo, _, digest = request.headers.get("X-Hub-Signature", "").partition("=")
+        if algo not in _SIGNATURE_ALGOS:
+            self.rejected += 1
+            logger.warning("WebSub notification without a valid signature header ignored")
+            # По спецификации на неподписанное уведомление всё равно отвечаем 2xx.
+            return web.Response(status=202)
+
+        # Подпись проверяется по сырому телу; неподписанный хабом XML не
+        # разбирается вовсе.
+        mac = hmac.new(self.secret.encode(), digestmod=algo)
+        body = bytearray()
+        async for chunk in request.content.iter_chunked(16384):
+            if len(body) + len(chunk) > MAX_BODY:
+                return web.Response(status=413)
+            mac.update(chunk)
+            body += chunk
+
+        if not hmac.compare_digest(mac.hexdigest(), digest.lower()):
+            self.rejected += 1
+            logger.warning("WebSub notification with a bad signature ignored")
+            return web.Response(status=202)
+
+        parser = ET.XMLPullParser(events=("end",))
+        try:
+            parser.feed(bytes(body))
+            parser.close()
+        except ET.ParseError as e:
+            logger.warning(f"WebSub notification is not valid XML: {e}")
+            return web.Response(status=400)
+        entries = _drain_entries(parser)
+
+        self.received += 1
+        if entries:
+            # Хабу отвечаем сразу; запросы к YouTube и Discord — в фоне.
+            task = asyncio.create_task(self._notify(entries))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+        return web.Response(status=204)
+
+    async def _notify(self, entries: list[tuple[str, str]]):
+        try:
+            sent = await youtube.notify_new_videos(self.bot, entries)
+            logger.info(f"WebSub: {len(entries)} entries, {sent} notifications sent")
+        except Exception as e:
+            logger.error(f"WebSub notification handling failed: {e!r}")
+
+    # ─── Мы → hub ───
+
+    async def subscribe(self, session: aiohttp.ClientSession, topic: str, mode: str = "subscribe"):
+        self._requested[topic] = time.monotonic()
+        data = {
+            "hub.callback": self.callback_url,
+            "hub.topic": topic,
+            "hub.mode": mode,
+            "hub.verify": "async",
+            "hub.lease_seconds": str(self.lease_seconds),
+            "hub.secret": self.secret,
+        }
+        async with session.post(self.hub_url, data=data) as resp:
+            if resp.status not in (202, 204):
+                logger.warning(f"WebSub {mode} for {topic} failed: {resp.status} {(await resp.text())[:200]}")
+
+    async def _renew_forever(self):
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                now = time.monotonic()
+                for topic in self.topics():
+                    left = self._leases.get(topic, 0) - now
+                    if left > self.lease_seconds * RENEW_MARGIN:
+                        continue
+                    if now - self._requested.get(topic, -RESUBSCRIBE_BACKOFF) < RESUBSCRIBE_BACKOFF:
+                        continue
+                    try:
+                        await self.subscribe(session, topic)
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        logger.warning(f"WebSub subscribe for {topic} failed: {e!r}")
+                await asyncio.sleep(RENEW_CHECK_INTERVAL)
+
+
+def _drain_entries(parser: ET.XMLPullParser) -> list[tuple[str, str]]:
+    """Забирает из парсера законченные <entry> как (channel_id, video_id)."""
+    entries = []
+    for _, elem in parser.read_events():
+        if elem.tag != _ATOM + "entry":
+            continue
+        video_id = elem.findtext(_YT + "videoId")
+        channel_id = elem.findtext(_YT + "channelId")
+        if video_id and channel_id:
+            entries.append((channel_id, video_id))
+        elem.clear()
+    return entries
+
+
+# ─── Запуск ───
+
+receiver: WebSubReceiver | None = None
+_poller: asyncio.Task | None = None
+
+
+async def _poll_forever(bot, interval: float):
+    """Запасной опрос: пропускается, пока WebSub покрывает все каналы."""
+    while True:
+        await asyncio.sleep(interval)
+        if receiver is not None and receiver.healthy():
+            continue
+        try:
+            await youtube.check_youtube_channels(bot=bot)
+        except youtube.YouTubeQuotaExhausted as e:
+            logger.warning(f"YouTube poll skipped: {e}")
+        except Exception as e:
+            logger.error(f"YouTube poll failed: {e!r}")
+
+
+async def start(bot):
+    """Запускает приёмник WebSub (если настроен) и запасной опрос.
+    Повторный вызов (on_ready после переподключения) ничего не делает."""
+    global receiver, _poller
+    await youtube.load_channels()
+    if WEBSUB_CALLBACK_URL and receiver is None:
+        # Без заданного секрета генерируется новый; подписки всё равно
+        # переоформляются при старте.
+        receiver = WebSubReceiver(
+            WEBSUB_CALLBACK_URL,
+            WEBSUB_SECRET or secrets.token_hex(16),
+            hub_url=WEBSUB_HUB_URL,
+            lease_seconds=WEBSUB_LEASE_SECONDS,
+        )
+        try:
+            await receiver.start(bot, WEBSUB_HOST, WEBSUB_PORT)
+        except OSError as e:
+            logger.error(f"WebSub receiver failed to start, falling back to polling: {e}")
+            await receiver.stop()
+            receiver = None
+    if YOUTUBE_POLL_INTERVAL > 0 and (_poller is None or _poller.done()):
+        _poller = asyncio.create_task(_poll_forever(bot, YOUTUBE_POLL_INTERVAL))
+
+
+async def stop():
+    if _poller:
+        _poller.cancel()
+    if receiver:
+        await receiver.stop()
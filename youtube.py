@@ -1,23 +1,52 @@
-"""YouTube: API-функции, проверка каналов, уведомления."""
+"""YouTube: API-функции, проверка каналов, уведомления.
 
-import discord
+Новые видео ищутся через плейлист загрузок канала (playlistItems.list,
+1 единица квоты) вместо search.list (100 единиц); подробности о видео
+запрашиваются одним videos.list на пачку до 50 ID.
+
+Все запросы идут через менеджер ключей: он учитывает расход квоты каждого
+ключа за текущие сутки по тихоокеанскому времени (квота YouTube
+сбрасывается в полночь PT), хранит его в БД и выбирает ключ с наибольшим
+остатком. Исчерпанные ключи пропускаются до сброса.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from logging import getLogger
+from typing import TYPE_CHECKING
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-import googleapiclient.discovery
+import discord
 import googleapiclient.errors
 
 from config import (
     YOUTUBE_API_KEYS,
-    YOUTUBE_CHANNEL_ID_1,
-    YOUTUBE_CHANNEL_ID_2,
+    YOUTUBE_DAILY_QUOTA,
     NOTIFICATION_CHANNEL_ID,
 )
 from database import (
     is_video_known,
     add_video_to_history,
+    add_videos_to_history,
     set_last_video_id,
+    get_youtube_quota,
+    get_youtube_channels,
+    add_youtube_channel,
+    remove_youtube_channel,
+    add_youtube_quota_usage,
+    mark_youtube_key_exhausted,
 )
 from embeds import LOG_COLORS, e_ok, e_err
+import metrics
+
+if TYPE_CHECKING:
+    import httplib2
+
+logger = getLogger(__name__)
 
 
 def _utcnow() -> datetime:
@@ -31,73 +60,414 @@ def dt_from_iso(s: str) -> datetime:
     return dt.astimezone(timezone.utc)
 
 
-def _get_youtube_service(api_key: str):
-    return googleapiclient.discovery.build('youtube', 'v3', developerKey=api_key)
+# ─── Client ───────────────────────────────────────────────────────────────
+# Сервис на каждый ключ строится один раз из discovery-документа, который
+# поставляется вместе с библиотекой (без сетевого запроса). HTTP-запросы
+# выполняются в небольшом пуле потоков; у каждого потока свой
+# httplib2.Http (он не потокобезопасен), что заодно переиспользует
+# соединения между запросами.
+#
+# googleapiclient.discovery и httplib2 — самые тяжёлые импорты процесса,
+# поэтому они загружаются при первом запросе, в потоке пула, а не при
+# старте бота. googleapiclient.errors лёгкий и нужен в except.
+
+YOUTUBE_HTTP_WORKERS = 4
+YOUTUBE_HTTP_TIMEOUT = 30
+
+_http_executor = ThreadPoolExecutor(max_workers=YOUTUBE_HTTP_WORKERS, thread_name_prefix="youtube")
+_thread_local = threading.local()
+_services: dict[str, object] = {}
+
+
+def _build_service(api_key: str):
+    import googleapiclient.discovery
+    return googleapiclient.discovery.build(
+        'youtube', 'v3', developerKey=api_key, static_discovery=True, cache_discovery=False,
+    )
+
+
+async def _get_youtube_service(api_key: str):
+    service = _services.get(api_key)
+    if service is None:
+        loop = asyncio.get_running_loop()
+        service = await loop.run_in_executor(_http_executor, _build_service, api_key)
+        _services.setdefault(api_key, service)
+    return _services[api_key]
+
+
+def _thread_http() -> "httplib2.Http":
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        import httplib2
+        http = _thread_local.http = httplib2.Http(timeout=YOUTUBE_HTTP_TIMEOUT)
+    return http
 
 
-async def fetch_all_videos_to_history() -> int:
-    """Парсит все публичные видео со всех YouTube каналов и сохраняет в video_history."""
-    total_saved = 0
-    for api_key in YOUTUBE_API_KEYS:
-        youtube = _get_youtube_service(api_key)
+async def _execute(request) -> dict:
+    """Выполняет запрос googleapiclient вне event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_http_executor, lambda: request.execute(http=_thread_http()))
+
+
+# ─── Quota ────────────────────────────────────────────────────────────────
+
+# Стоимость вызова list в единицах квоты.
+QUOTA_COSTS = {
+    "search": 100,
+    "playlistItems": 1,
+    "videos": 1,
+    "channels": 1,
+}
+
+try:
+    _PACIFIC = ZoneInfo("America/Los_Angeles")
+except ZoneInfoNotFoundError:
+    # Нет базы часовых поясов (tzdata): PST без учёта летнего времени.
+    _PACIFIC = timezone(timedelta(hours=-8))
+
+
+class YouTubeQuotaExhausted(Exception):
+    """Квота исчерпана на всех ключах до следующего сброса."""
+
+
+def _quota_day() -> str:
+    return datetime.now(_PACIFIC).date().isoformat()
+
+
+def _key_id(api_key: str) -> str:
+    """Короткий идентификатор ключа для БД и логов — сам ключ не сохраняется."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+class YouTubeKeyManager:
+    def __init__(self, keys: list[str], daily_quota: int):
+        self.keys = [k for k in keys if k]
+        self.daily_quota = daily_quota
+        self._ids = {k: _key_id(k) for k in self.keys}
+        self._day: str | None = None
+        self._used: dict[str, int] = {}
+        self._exhausted: set[str] = set()
+        self._lock = asyncio.Lock()
+
+    async def _refresh_day(self):
+        day = _quota_day()
+        if day == self._day:
+            return
+        async with self._lock:
+            if day == self._day:
+                return
+            stored = await get_youtube_quota(day)
+            self._used = {k: stored.get(self._ids[k], (0, False))[0] for k in self.keys}
+            self._exhausted = {k for k in self.keys if stored.get(self._ids[k], (0, False))[1]}
+            self._day = day
+
+    def remaining(self, api_key: str) -> int:
+        if api_key in self._exhausted:
+            return 0
+        return max(0, self.daily_quota - self._used.get(api_key, 0))
+
+    async def acquire(self, cost: int) -> str:
+        """Ключ с наибольшим остатком, которому хватает квоты на запрос."""
+        await self._refresh_day()
+        best = max(self.keys, key=self.remaining, default=None)
+        if best is None or self.remaining(best) < cost:
+            raise YouTubeQuotaExhausted(
+                f"YouTube API quota exhausted on all {len(self.keys)} keys for {self._day} (PT)"
+            )
+        return best
+
+    async def record(self, api_key: str, cost: int):
+        self._used[api_key] = self._used.get(api_key, 0) + cost
+        await add_youtube_quota_usage(self._ids[api_key], self._day, cost)
+
+    async def mark_exhausted(self, api_key: str):
+        logger.warning(f"YouTube key {self._ids[api_key]} exhausted until reset")
+        self._exhausted.add(api_key)
+        await mark_youtube_key_exhausted(self._ids[api_key], self._day)
+
+    async def budget(self) -> list[dict]:
+        await self._refresh_day()
+        return [
+            {
+                "key": self._ids[k],
+                "used": self._used.get(k, 0),
+                "remaining": self.remaining(k),
+                "exhausted": k in self._exhausted,
+            }
+            for k in self.keys
+        ]
+
+
+key_manager = YouTubeKeyManager(YOUTUBE_API_KEYS, YOUTUBE_DAILY_QUOTA)
+
+
+def _is_quota_error(e: googleapiclient.errors.HttpError) -> bool:
+    return e.resp.status == 403 and ('quotaExceeded' in str(e) or 'dailyLimitExceeded' in str(e))
+
+
+async def _api(resource: str, *, etag: str | None = None, **params) -> dict | None:
+    """Выполняет {resource}.list(**params) на подходящем ключе.
+
+    Если YouTube отвечает, что квота ключа исчерпана, ключ помечается и
+    запрос повторяется на следующем; когда ключей не осталось —
+    YouTubeQuotaExhausted. С etag запрос условный: при ответе 304
+    возвращается None.
+    """
+    cost = QUOTA_COSTS.get(resource, 1)
+    while True:
+        api_key = await key_manager.acquire(cost)
+        youtube = await _get_youtube_service(api_key)
+        request = getattr(youtube, resource)().list(**params)
+        if etag:
+            request.headers['If-None-Match'] = etag if etag.startswith('"') else f'"{etag}"'
+        started = time.perf_counter()
         try:
-            for ch_id in (YOUTUBE_CHANNEL_ID_1, YOUTUBE_CHANNEL_ID_2):
-                page_token = None
-                while True:
-                    req = youtube.search().list(
-                        part="snippet",
-                        channelId=ch_id,
-                        order="date",
-                        maxResults=50,
-                        type="video",
-                        pageToken=page_token,
-                    )
-                    resp = req.execute()
-                    for item in resp.get('items', []):
-                        if item['id']['kind'] == 'youtube#video':
-                            video_id = item['id']['videoId']
-                            if not is_video_known(ch_id, video_id):
-                                add_video_to_history(ch_id, video_id)
-                                total_saved += 1
-                    page_token = resp.get('nextPageToken')
-                    if not page_token:
-                        break
-            return total_saved
+            resp = await _execute(request)
         except googleapiclient.errors.HttpError as e:
-            if e.resp.status == 403 and 'quotaExceeded' in str(e):
-                pass  # logged below
-            else:
-                raise
-    return total_saved
+            metrics.youtube_api.observe(f"{resource}.list", time.perf_counter() - started, e.resp.status != 304)
+            if etag and e.resp.status == 304:
+                # 304 тоже тарифицируется, но без тела ответа и его разбора.
+                await key_manager.record(api_key, cost)
+                return None
+            if _is_quota_error(e):
+                await key_manager.mark_exhausted(api_key)
+                continue
+            # Неудачные запросы тоже расходуют квоту.
+            await key_manager.record(api_key, cost)
+            raise
+        metrics.youtube_api.observe(f"{resource}.list", time.perf_counter() - started)
+        await key_manager.record(api_key, cost)
+        return resp
+
+
+# ─── API helpers ──────────────────────────────────────────────────────────
+
+# (ресурс, параметры) -> (etag, последний полный ответ) для условных опросов.
+_etag_cache: dict[tuple, tuple[str, dict]] = {}
+_etag_counters = {"conditional": 0, "not_modified": 0}
+
+
+def _etag_key(resource: str, params: dict) -> tuple:
+    return resource, tuple(sorted(params.items()))
+
+
+async def _api_cached(resource: str, *, store: bool = True, **params) -> tuple[dict, bool]:
+    """Условный запрос с If-None-Match; возвращает (ответ, изменился ли).
+
+    Для неизменившегося ресурса возвращается сохранённый ответ. С
+    store=False новый ETag не запоминается — вызывающий сохраняет его через
+    _store_etag, когда ответ обработан.
+    """
+    key = _etag_key(resource, params)
+    cached = _etag_cache.get(key)
+    if cached is not None:
+        _etag_counters["conditional"] += 1
+    resp = await _api(resource, etag=cached[0] if cached else None, **params)
+    if resp is None:
+        _etag_counters["not_modified"] += 1
+        return cached[1], False
+    if store:
+        _store_etag(resource, resp, **params)
+    return resp, True
+
+
+def _store_etag(resource: str, resp: dict, **params):
+    if resp.get('etag'):
+        _etag_cache[_etag_key(resource, params)] = (resp['etag'], resp)
+
+
+def etag_stats() -> dict:
+    conditional = _etag_counters["conditional"]
+    return {
+        **_etag_counters,
+        "hit_rate": round(_etag_counters["not_modified"] / conditional, 3) if conditional else 0.0,
+    }
+
+
+# channel_id -> ID плейлиста загрузок; не меняется, поэтому кэшируется навсегда.
+_uploads_playlists: dict[str, str] = {}
+
+
+async def _uploads_playlist_id(channel_id: str) -> str:
+    playlist_id = _uploads_playlists.get(channel_id)
+    if playlist_id:
+        return playlist_id
+    resp = await _api("channels", part="contentDetails", id=channel_id)
+    items = resp.get('items')
+    if not items:
+        raise ValueError(f"YouTube channel {channel_id} not found")
+    playlist_id = items[0]['contentDetails']['relatedPlaylists']['uploads']
+    _uploads_playlists[channel_id] = playlist_id
+    return playlist_id
+
+
+async def _latest_upload_ids(channel_id: str, max_results: int = 1) -> list[str]:
+    resp = await _api(
+        "playlistItems",
+        part="contentDetails",
+        playlistId=await _uploads_playlist_id(channel_id),
+        maxResults=max_results,
+    )
+    return [item['contentDetails']['videoId'] for item in resp.get('items', [])]
+
+
+# channel_id -> (параметры, ответ) опроса playlistItems, чей ETag ещё не
+# сохранён: новое видео пока не обработано (см. _confirm_polled).
+_unconfirmed_polls: dict[str, tuple[dict, dict]] = {}
+
+
+async def _poll_latest_upload(channel_id: str) -> str | None:
+    """ID последнего загруженного видео или None, если плейлист не
+    изменился с прошлого опроса (или пуст).
+
+    ETag изменившегося плейлиста запоминается только в _confirm_polled,
+    после того как видео попало в video_history. Если обработка сорвалась
+    (ошибка API, видео ещё не отдаётся videos.list, нет канала Discord),
+    следующий опрос снова получит 200 и повторит попытку.
+    """
+    params = {"part": "contentDetails", "playlistId": await _uploads_playlist_id(channel_id), "maxResults": 1}
+    resp, changed = await _api_cached("playlistItems", store=False, **params)
+    if not changed:
+        return None
+    items = resp.get('items')
+    if not items:
+        _store_etag("playlistItems", resp, **params)
+        return None
+    _unconfirmed_polls[channel_id] = (params, resp)
+    return items[0]['contentDetails']['videoId']
+
+
+async def _confirm_polled(channel_id: str, video_id: str):
+    """Сохраняет ETag опроса канала, если его видео уже есть в video_history."""
+    pending = _unconfirmed_polls.pop(channel_id, None)
+    if pending is None:
+        return
+    params, resp = pending
+    if resp['items'][0]['contentDetails']['videoId'] == video_id and await is_video_known(channel_id, video_id):
+        _store_etag("playlistItems", resp, **params)
+
+
+async def _video_details(video_ids: list[str]) -> dict[str, dict]:
+    """videos.list по пачкам до 50 ID; возвращает video_id -> ресурс видео."""
+    details = {}
+    for i in range(0, len(video_ids), 50):
+        resp = await _api("videos", part="snippet", id=",".join(video_ids[i:i + 50]))
+        for item in resp.get('items', []):
+            details[item['id']] = item
+    return details
+
+
+# ─── Channels ─────────────────────────────────────────────────────────────
+# Отслеживаемые каналы хранятся в таблице youtube_channels; здесь — их
+# копия в памяти, которая перечитывается после изменений.
+
+YOUTUBE_FANOUT = 8      # сколько каналов опрашивать одновременно
+
+# channel_id -> {"notify_channel_id", "mention", "message"}
+YT_CHANNELS: dict[str, dict] = {}
+_channels_loaded = False
+
+
+async def load_channels() -> dict[str, dict]:
+    global _channels_loaded
+    rows = await get_youtube_channels()
+    YT_CHANNELS.clear()
+    YT_CHANNELS.update((r["channel_id"], r) for r in rows)
+    _channels_loaded = True
+    return YT_CHANNELS
+
+
+async def _ensure_channels():
+    if not _channels_loaded:
+        await load_channels()
+
+
+async def add_channel(channel_id: str, notify_channel_id: int | None, mention: str, message: str):
+    """Добавляет (или обновляет) канал; ValueError, если канала нет на YouTube."""
+    await _uploads_playlist_id(channel_id)
+    await add_youtube_channel(channel_id, notify_channel_id, mention, message)
+    await load_channels()
+
+
+async def remove_channel(channel_id: str) -> bool:
+    removed = await remove_youtube_channel(channel_id)
+    await load_channels()
+    return removed
+
+
+class _SafeFormat(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def _render_message(template: str, item: dict) -> str:
+    """Подставляет {title}, {url}, {channel} в шаблон сообщения канала."""
+    values = _SafeFormat(
+        title=item['snippet']['title'],
+        url=f"https://www.youtube.com/watch?v={item['id']}",
+        channel=item['snippet']['channelTitle'],
+    )
+    try:
+        return template.format_map(values)
+    except (ValueError, IndexError):
+        return template
+
+
+# ─── Public API ───────────────────────────────────────────────────────────
+
+async def fetch_all_videos_to_history() -> dict:
+    """Парсит все публичные видео со всех YouTube каналов и сохраняет в video_history.
+
+    Каждая страница (до 50 ID) записывается одним INSERT OR IGNORE.
+    Возвращает статистику: saved, pages, rows, elapsed.
+    """
+    await _ensure_channels()
+    saved = pages = rows = 0
+    started = time.perf_counter()
+    for ch_id in list(YT_CHANNELS):
+        playlist_id = await _uploads_playlist_id(ch_id)
+        page_token = None
+        while True:
+            resp = await _api(
+                "playlistItems",
+                part="contentDetails",
+                playlistId=playlist_id,
+                maxResults=50,
+                pageToken=page_token,
+            )
+            video_ids = [item['contentDetails']['videoId'] for item in resp.get('items', [])]
+            if video_ids:
+                saved += await add_videos_to_history(ch_id, video_ids)
+            pages += 1
+            rows += len(video_ids)
+            page_token = resp.get('nextPageToken')
+            if not page_token:
+                break
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"YouTube backfill: {saved} new of {rows} videos, {pages} pages in {elapsed:.1f}s "
+        f"({pages / elapsed:.1f} pages/s, {rows / elapsed:.0f} rows/s)"
+    )
+    return {"saved": saved, "pages": pages, "rows": rows, "elapsed": elapsed}
 
 
 async def fetch_and_save_latest_video_ids():
     """Обновляет ID последних видео без уведомлений."""
-    for api_key in YOUTUBE_API_KEYS:
-        youtube = _get_youtube_service(api_key)
-        try:
-            for ch_id in (YOUTUBE_CHANNEL_ID_1, YOUTUBE_CHANNEL_ID_2):
-                req = youtube.search().list(part="snippet", channelId=ch_id, order="date", maxResults=1)
-                resp = req.execute()
-                if resp.get('items'):
-                    item = resp['items'][0]
-                    if item['id']['kind'] == 'youtube#video':
-                        video_id = item['id']['videoId']
-                        set_last_video_id(ch_id, video_id)
-                        add_video_to_history(ch_id, video_id)
-                    else:
-                        pass  # non-video item
-            return
-        except googleapiclient.errors.HttpError as e:
-            if e.resp.status == 403 and 'quotaExceeded' in str(e):
-                pass
-            else:
-                raise
+    await _ensure_channels()
+    for ch_id in list(YT_CHANNELS):
+        latest = await _latest_upload_ids(ch_id)
+        if latest:
+            video_id = latest[0]
+            await set_last_video_id(ch_id, video_id)
+            await add_video_to_history(ch_id, video_id)
 
 
 async def _send_video_notification(channel, ch_id: str, item: dict, text: str, mention: str):
-    """Отправляет уведомление о новом видео в указанный канал."""
-    video_id = item['id']['videoId']
+    """Отправляет уведомление о новом видео в указанный канал.
+
+    item — ресурс видео из videos.list.
+    """
+    video_id = item['id']
     title = item['snippet']['title']
     channel_name = item['snippet']['channelTitle']
     published_at = dt_from_iso(item['snippet']['publishedAt'])
@@ -123,56 +493,117 @@ async def _send_video_notification(channel, ch_id: str, item: dict, text: str, m
         await channel.send(embed=embed)
 
 
+# Опрос, WebSub и ручная проверка могут одновременно увидеть одно видео.
+_notify_lock = asyncio.Lock()
+
+
+async def notify_new_videos(bot, candidates: list[tuple[str, str]]) -> int:
+    """Общий путь для опроса и WebSub: дедупликация по video_history,
+    проверка свежести и уведомления. candidates — пары (channel_id, video_id).
+
+    Подробности о всех новых видео запрашиваются одним videos.list.
+    Возвращает число отправленных уведомлений.
+    """
+    await _ensure_channels()
+    async with _notify_lock:
+        new_videos = []
+        for ch_id, video_id in dict.fromkeys(candidates):
+            if ch_id not in YT_CHANNELS:
+                continue
+            # Если видео уже известно — не уведомляем
+            if await is_video_known(ch_id, video_id):
+                continue
+            new_videos.append((ch_id, video_id))
+        if not new_videos:
+            return 0
+
+        sent = 0
+        details = await _video_details([video_id for _, video_id in new_videos])
+        for ch_id, video_id in new_videos:
+            item = details.get(video_id)
+            cfg = YT_CHANNELS.get(ch_id)
+            if item is None or cfg is None:
+                continue
+            published_at = dt_from_iso(item['snippet']['publishedAt'])
+
+            # Проверка свежести: видео должно быть не старше 2 часов
+            video_age_seconds = (_utcnow() - published_at).total_seconds()
+            if video_age_seconds > 7200:
+                # Всё равно добавляем в историю, чтобы не проверять это видео снова
+                await add_video_to_history(ch_id, video_id)
+                continue
+
+            target = bot.get_channel(cfg["notify_channel_id"] or NOTIFICATION_CHANNEL_ID)
+            if target is None:
+                logger.warning(f"Notification channel for YouTube channel {ch_id} not found")
+                continue
+
+            # Видео новое и свежее — добавляем в историю и уведомляем
+            await add_video_to_history(ch_id, video_id)
+            await set_last_video_id(ch_id, video_id)
+
+            text = _render_message(cfg["message"], item)
+            await _send_video_notification(target, ch_id, item, text, cfg["mention"])
+            sent += 1
+        return sent
+
+
 async def check_youtube_channels(reply_channel=None, bot=None):
-    """Проверяет новые видео и отправляет уведомления."""
-    import discord
-    notification_channel = bot.get_channel(NOTIFICATION_CHANNEL_ID) if bot else None
-    if not notification_channel:
+    """Проверяет новые видео на всех каналах и отправляет уведомления.
+
+    Каналы опрашиваются параллельно (не более YOUTUBE_FANOUT одновременно);
+    ошибка одного канала не мешает остальным. Если квота кончилась на части
+    каналов, уже найденные видео всё равно обрабатываются. С reply_channel
+    ошибки сообщаются туда (по одному сообщению на вид) и не пробрасываются;
+    без него — пробрасываются вызывающему.
+    """
+    if bot is None:
         return
+    await _ensure_channels()
+    semaphore = asyncio.Semaphore(YOUTUBE_FANOUT)
 
-    yt_configs = [
-        (YOUTUBE_CHANNEL_ID_1, "<@&1104385788797534228>", "На канале какая-то движуха. А ну-ка глянем"),
-        (YOUTUBE_CHANNEL_ID_2, "<@&1265571159601319989>", "На втором канале что-то появилось. Давайте-ка заценим"),
-    ]
+    async def poll(ch_id: str) -> str | None:
+        async with semaphore:
+            return await _poll_latest_upload(ch_id)
 
-    for api_key in YOUTUBE_API_KEYS:
-        youtube = _get_youtube_service(api_key)
-        try:
-            for ch_id, mention, text in yt_configs:
-                req = youtube.search().list(part="snippet", channelId=ch_id, order="date", maxResults=1)
-                resp = req.execute()
-                if resp.get('items'):
-                    item = resp['items'][0]
-                    if item['id']['kind'] != 'youtube#video':
-                        continue
-
-                    video_id = item['id']['videoId']
-                    published_at = dt_from_iso(item['snippet']['publishedAt'])
-
-                    # Если видео уже известно — не уведомляем
-                    if is_video_known(ch_id, video_id):
-                        continue
-
-                    # Проверка свежести: видео должно быть не старше 2 часов
-                    video_age_seconds = (_utcnow() - published_at).total_seconds()
-                    if video_age_seconds > 7200:
-                        # Всё равно добавляем в историю, чтобы не проверять это видео снова
-                        add_video_to_history(ch_id, video_id)
-                        continue
-
-                    # Видео новое и свежее — добавляем в историю и уведомляем
-                    add_video_to_history(ch_id, video_id)
-                    set_last_video_id(ch_id, video_id)
-
-                    await _send_video_notification(notification_channel, ch_id, item, text, mention)
-
-            if reply_channel:
-                await reply_channel.send(embed=e_ok("YouTube проверен", "Каналы успешно проверены."))
-            return
-        except googleapiclient.errors.HttpError as e:
-            if e.resp.status == 403 and 'quotaExceeded' in str(e):
-                pass
-            else:
-                if reply_channel:
-                    await reply_channel.send(embed=e_err("Ошибка YouTube API", str(e)[:200]))
-                raise
+    channel_ids = list(YT_CHANNELS)
+    # Дешёвый условный опрос плейлистов; неизменившийся плейлист (304)
+    # не требует ни разбора ответа, ни обращения к БД.
+    results = await asyncio.gather(*(poll(ch_id) for ch_id in channel_ids), return_exceptions=True)
+
+    candidates, errors = [], []
+    quota_error: YouTubeQuotaExhausted | None = None
+    for ch_id, result in zip(channel_ids, results):
+        if isinstance(result, YouTubeQuotaExhausted):
+            quota_error = quota_error or result
+        elif isinstance(result, Exception):
+            logger.error(f"YouTube poll of {ch_id} failed: {result!r}")
+            errors.append(f"`{ch_id}`: {str(result)[:150]}")
+        elif result is not None:
+            candidates.append((ch_id, result))
+
+    try:
+        await notify_new_videos(bot, candidates)
+    except YouTubeQuotaExhausted as e:
+        quota_error = quota_error or e
+    except googleapiclient.errors.HttpError as e:
+        if not reply_channel:
+            raise
+        logger.error(f"YouTube video details failed: {e!r}")
+        errors.append(f"videos.list: {str(e)[:150]}")
+    finally:
+        # ETag запоминается только для обработанных видео, остальные
+        # опросятся заново.
+        for ch_id, video_id in candidates:
+            await _confirm_polled(ch_id, video_id)
+
+    if not reply_channel:
+        if quota_error:
+            raise quota_error
+        return
+    if quota_error:
+        await reply_channel.send(embed=e_err("Квота YouTube исчерпана", str(quota_error)))
+    if errors:
+        await reply_channel.send(embed=e_err("Ошибка YouTube API", "\n".join(errors)[:4000]))
+    if not quota_error and not errors:
+        await reply_channel.send(embed=e_ok("YouTube проверен", f"Каналов проверено: {len(channel_ids)}."))